@@ -0,0 +1,83 @@
+# Cold-start benchmark for classify.py: every run is a fresh interpreter, as
+# it would be when called from a shell or another program.
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLASSIFY = os.path.join(ROOT, 'classify.py')
+SAMPLE_TEAM = os.path.join(ROOT, 'benchmarks', 'sample_team.txt')
+
+def time_command(args, runs):
+    """Wall-clock seconds of each of ``runs`` fresh-process runs
+
+    Raises RuntimeError with the command's error output if a run fails.
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"{subprocess.list2cmdline(args)} exited with code "
+                               f"{result.returncode}:\n{result.stderr.rstrip()}")
+    return timings
+
+def slowest_imports(args, count=10):
+    """The top-level imports with the largest cumulative -X importtime cost"""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Only top-level imports; nested ones are already counted in their parent
+        if name.startswith('  '):
+            continue
+        imports.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+def run_benchmark(runs, team_path, extra_args):
+    stages = [
+        ("interpreter", [sys.executable, '-c', 'pass']),
+        ("imports (--help)", [sys.executable, CLASSIFY, '--help']),
+        ("classify one team", [sys.executable, CLASSIFY, team_path] + extra_args),
+    ]
+
+    results = {}
+    for label, args in stages:
+        timings = time_command(args, runs)
+        results[label] = statistics.median(timings)
+        print(f"{label:<20} median {results[label] * 1000:8.1f} ms   "
+              f"min {min(timings) * 1000:8.1f} ms   ({runs} runs)")
+
+    print("\nSlowest imports when classifying:")
+    for seconds, name in slowest_imports([CLASSIFY, team_path] + extra_args):
+        print(f"  {seconds * 1000:8.1f} ms  {name}")
+
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure classify.py cold-start time")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--team', default=SAMPLE_TEAM)
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help="exit 1 if the median classify run takes longer than this")
+    parser.add_argument('classify_args', nargs=argparse.REMAINDER,
+                        help="extra arguments passed to classify.py (e.g. --model ...)")
+    args = parser.parse_args()
+
+    # REMAINDER keeps the '--' that separates them from this script's own flags
+    classify_args = args.classify_args[1:] if args.classify_args[:1] == ['--'] else args.classify_args
+    try:
+        results = run_benchmark(args.runs, args.team, classify_args)
+    except RuntimeError as e:
+        print(f"Benchmark run failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.budget_ms is not None and results["classify one team"] * 1000 > args.budget_ms:
+        print(f"\nCold start exceeds the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
@@ -0,0 +1,80 @@
+# Batch inference latency: sklearn's scaler + predict_proba against the
+# NumPy forest engine on the model artifact, for batch sizes from one team
+# up to 100k.
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from classify import DEFAULT_MODEL_PATH, DEFAULT_SCALER_PATH
+from feature_store import FeatureStore
+from forest_engine import ForestEngine
+from model_artifact import ARTIFACT_PATH
+import joblib
+import numpy as np
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000]
+
+def time_calls(function, X, repeats, budget_seconds=2.0):
+    """Seconds per call, over up to ``repeats`` calls or until the budget is spent"""
+    timings = []
+    while len(timings) < repeats and sum(timings) < budget_seconds:
+        start = time.perf_counter()
+        function(X)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def sample_rows(scaler, count, feature_store=None, seed=0):
+    """Rows drawn from the feature store, or around the scaler's mean and scale"""
+    rng = np.random.default_rng(seed)
+    if feature_store:
+        _, features, _ = FeatureStore(feature_store).load()
+        return np.asarray(features)[rng.integers(0, len(features), count)]
+    return rng.normal(scaler.mean_, scaler.scale_, size=(count, len(scaler.mean_)))
+
+def run_benchmark(model_path, scaler_path, artifact_path, batch_sizes, repeats, feature_store=None):
+    clf = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    engine = ForestEngine.load(artifact_path)
+    print(f"{engine.n_trees} trees, {engine.artifact.n_nodes} nodes, depth {engine.depth}\n")
+
+    def sklearn_predict(X):
+        return clf.predict_proba(scaler.transform(X))
+
+    X_all = sample_rows(scaler, max(batch_sizes), feature_store)
+    print(f"{'batch':>8} {'sklearn ms':>11} {'engine ms':>10} {'speedup':>8} "
+          f"{'engine us/row':>14} {'max |diff|':>11}")
+    results = []
+    for batch_size in batch_sizes:
+        X = X_all[:batch_size]
+        difference = float(np.abs(engine.predict_proba(X) - sklearn_predict(X)).max())
+        sklearn_seconds = statistics.median(time_calls(sklearn_predict, X, repeats))
+        engine_seconds = statistics.median(time_calls(engine.predict_proba, X, repeats))
+        results.append({
+            'batch_size': batch_size,
+            'sklearn_ms': sklearn_seconds * 1000,
+            'engine_ms': engine_seconds * 1000,
+            'max_difference': difference
+        })
+        print(f"{batch_size:>8} {sklearn_seconds * 1000:>11.2f} {engine_seconds * 1000:>10.2f} "
+              f"{sklearn_seconds / engine_seconds:>7.1f}x {engine_seconds / batch_size * 1e6:>14.2f} "
+              f"{difference:>11.1e}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sklearn and forest engine inference by batch size")
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--scaler', default=DEFAULT_SCALER_PATH)
+    parser.add_argument('--artifact', default=ARTIFACT_PATH)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=BATCH_SIZES)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--feature-store', metavar='DIR',
+                        help="sample rows from the feature store in DIR instead of around the scaler mean")
+    args = parser.parse_args()
+
+    run_benchmark(args.model, args.scaler, args.artifact, args.batch_sizes, args.repeats,
+                  args.feature_store)
@@ -0,0 +1,113 @@
+# Per-worker cost of loading the classifier: joblib pickles against the
+# memory-mapped model artifact. Workers are fresh interpreters that stay
+# alive together, so PSS (resident memory with shared pages divided among
+# the processes sharing them) shows how much of the model they share.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from classify import DEFAULT_MODEL_PATH, DEFAULT_SCALER_PATH
+from model_artifact import ARTIFACT_PATH
+
+def memory_usage():
+    """Resident memory of this process in bytes, from /proc (Linux only)"""
+    usage = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('VmRSS', 'RssAnon', 'RssFile'):
+                usage[key] = int(value.split()[0]) * 1024
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    usage['Pss'] = int(line.split()[1]) * 1024
+    except FileNotFoundError:
+        pass
+    return usage
+
+def worker(kind, paths):
+    """Load the model, report readiness, then memory once the parent says go"""
+    import numpy as np
+    before = memory_usage()
+    start = time.perf_counter()
+    if kind == 'joblib':
+        import joblib
+        clf, scaler = joblib.load(paths[0]), joblib.load(paths[1])
+    else:
+        from model_artifact import ModelArtifact
+        artifact = ModelArtifact(paths[0])
+        # Fault every page in, as serving requests eventually would
+        for values in artifact.arrays.values():
+            np.add.reduce(values, axis=None)
+    load_seconds = time.perf_counter() - start
+
+    print('ready', flush=True)
+    sys.stdin.readline()
+    after = memory_usage()
+    print(json.dumps({
+        'load_seconds': load_seconds,
+        'rss': after['VmRSS'],
+        'rss_added': after['VmRSS'] - before['VmRSS'],
+        'anon': after.get('RssAnon', 0),
+        'pss': after.get('Pss', 0)
+    }), flush=True)
+
+def run_workers(kind, paths, workers):
+    """Start ``workers`` loaders together; their results once all have loaded"""
+    processes = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), '--worker', kind] + paths,
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    for process in processes:
+        if process.stdout.readline().strip() != 'ready':
+            raise RuntimeError(f"{kind} worker failed to load the model")
+    results = []
+    for process in processes:
+        process.stdin.write('\n')
+        process.stdin.flush()
+        results.append(json.loads(process.stdout.readline()))
+    for process in processes:
+        process.stdin.close()
+        process.wait()
+    return results
+
+def run_benchmark(workers, model_path, scaler_path, artifact_path):
+    print(f"joblib:   {(os.path.getsize(model_path) + os.path.getsize(scaler_path)) / 2**20:.1f} MiB on disk")
+    print(f"artifact: {os.path.getsize(artifact_path) / 2**20:.1f} MiB on disk\n")
+    print(f"{'loader':<10} {'load ms':>9} {'RSS MiB':>9} {'+RSS MiB':>9} {'anon MiB':>9} "
+          f"{'PSS MiB':>9} {'total PSS':>10}   ({workers} workers, medians)")
+
+    results = {}
+    for kind, paths in [('joblib', [model_path, scaler_path]), ('artifact', [artifact_path])]:
+        runs = run_workers(kind, paths, workers)
+        median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        median['total_pss'] = sum(run['pss'] for run in runs)
+        results[kind] = median
+        print(f"{kind:<10} {median['load_seconds'] * 1000:>9.1f} {median['rss'] / 2**20:>9.1f} "
+              f"{median['rss_added'] / 2**20:>9.1f} {median['anon'] / 2**20:>9.1f} "
+              f"{median['pss'] / 2**20:>9.1f} {median['total_pss'] / 2**20:>10.1f}")
+    return results
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['--worker']:
+        worker(sys.argv[2], sys.argv[3:])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Compare model load time and memory per worker")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--scaler', default=DEFAULT_SCALER_PATH)
+    parser.add_argument('--artifact', default=ARTIFACT_PATH)
+    args = parser.parse_args()
+
+    run_benchmark(args.workers, os.path.abspath(args.model), os.path.abspath(args.scaler),
+                  os.path.abspath(args.artifact))
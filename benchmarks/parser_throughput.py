@@ -0,0 +1,54 @@
+# Team text parsing throughput on one core: parse_team_text over synthetic
+# teams, or the teams of an export file, reported as teams and megabytes
+# per second (best of several passes).
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import generate_reference, generate_teams, DEFAULT_SEED
+from databases.team_files import read_teams, split_teams
+from databases.team_parser import parse_team_text
+
+DEFAULT_TEAMS = 20000
+
+def load_texts(teams, seed=DEFAULT_SEED, teams_file=None):
+    """Team texts as process_team receives them, from ``teams_file`` or synthetic"""
+    if teams_file:
+        records = read_teams(teams_file)
+    else:
+        records = split_teams(''.join(generate_teams(teams, generate_reference(seed), seed)))
+    return [record['team_text'] for record in records]
+
+def measure(texts, passes, parse=parse_team_text):
+    """Best seconds for one pass of ``parse`` over every text; teams that fail count too"""
+    best = None
+    for _ in range(passes):
+        start = time.perf_counter()
+        for text in texts:
+            try:
+                parse(text)
+            except ValueError:
+                pass
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure parse_team_text throughput")
+    parser.add_argument('--teams', type=int, default=DEFAULT_TEAMS, help="number of synthetic teams")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--teams-file', metavar='PATH', help="parse the teams of this export instead")
+    parser.add_argument('--passes', type=int, default=5)
+    args = parser.parse_args()
+
+    texts = load_texts(args.teams, args.seed, args.teams_file)
+    megabytes = sum(len(text.encode('utf-8')) for text in texts) / 1e6
+    lines = sum(text.count('\n') + 1 for text in texts)
+    seconds = measure(texts, args.passes)
+    print(f"{len(texts)} teams, {lines} lines, {megabytes:.1f} MB, best of {args.passes} passes")
+    print(f"{seconds:.3f} s: {len(texts) / seconds:,.0f} teams/s, "
+          f"{seconds / len(texts) * 1e6:.1f} us/team, {megabytes / seconds:.1f} MB/s")
@@ -0,0 +1,190 @@
+# End-to-end pipeline benchmark on synthetic data and a scratch SQLite
+# database: every stage from splitting the export to predicting is timed,
+# and the results are saved as JSON to compare against earlier runs.
+from contextlib import contextmanager, redirect_stdout
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import generate_reference, write_teams, insert_reference, DEFAULT_SEED
+
+DEFAULT_TEAMS = 5000
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+# A stage regresses when its time per item grows by more than this fraction
+DEFAULT_THRESHOLD = 0.25
+
+@contextmanager
+def timed(results, name, items):
+    """Record the wall-clock time of the block as stage ``name`` over ``items`` items"""
+    start = time.perf_counter()
+    yield
+    seconds = time.perf_counter() - start
+    results[name] = {
+        'seconds': seconds,
+        'items': items,
+        'items_per_second': items / seconds if seconds > 0 else None
+    }
+    print(f"{name:<18} {seconds:>9.2f} s {items / seconds if seconds > 0 else 0:>12.0f} items/s")
+
+def _versions():
+    import numpy
+    import sklearn
+    import sqlalchemy
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': numpy.__version__,
+        'sklearn': sklearn.__version__,
+        'sqlalchemy': sqlalchemy.__version__
+    }
+
+def run_pipeline(teams, seed, workdir):
+    """Run every stage on ``teams`` synthetic teams; stage name -> timing"""
+    # The database modules read DATABASE_URL when first imported
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    from databases import database
+    from databases.reference_cache import ReferenceCache
+    from databases.team_files import split_teams
+    from databases.team_parser import parse_team_text
+    from databases.process_team import process_team
+    from databases.aggregate_stats import update_team_stats
+    from train_classifier import load_team_data, N_ESTIMATORS
+    from model_artifact import export_model_artifact
+    from forest_engine import ForestEngine
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.ensemble import RandomForestClassifier
+
+    results = {}
+    teams_path = os.path.join(workdir, 'teams.txt')
+    reference = generate_reference(seed)
+    with timed(results, 'generate', teams):
+        write_teams(teams_path, teams, reference, seed)
+
+    reference_rows = sum(len(rows) for rows in reference.values())
+    with timed(results, 'load_reference', reference_rows):
+        session = database.Session()
+        try:
+            insert_reference(session, reference)
+        finally:
+            session.close()
+        cache = ReferenceCache().load()
+
+    with timed(results, 'split_teams', teams):
+        with open(teams_path, 'r', encoding='utf-8') as f:
+            records = split_teams(f.read())
+
+    with timed(results, 'parse_team_text', teams):
+        for record in records:
+            parse_team_text(record['team_text'])
+
+    # Their per-team progress lines would swamp the report
+    with open(os.devnull, 'w') as devnull:
+        with timed(results, 'process_team', teams), redirect_stdout(devnull):
+            inserted = sum(bool(process_team(record['team_text'], cache)) for record in records)
+        if inserted != teams:
+            raise RuntimeError(f"Only {inserted} of {teams} synthetic teams were inserted")
+
+        with timed(results, 'update_team_stats', teams), redirect_stdout(devnull):
+            update_team_stats()
+
+    with timed(results, 'load_team_data', teams):
+        X, y = load_team_data()
+
+    with timed(results, 'fit', len(X)):
+        scaler = StandardScaler()
+        clf = RandomForestClassifier(n_estimators=N_ESTIMATORS, random_state=42, class_weight='balanced')
+        clf.fit(scaler.fit_transform(X), y)
+
+    with timed(results, 'predict', len(X)):
+        clf.predict_proba(scaler.transform(X))
+
+    artifact_path = os.path.join(workdir, 'model.forest')
+    export_model_artifact(clf, scaler, artifact_path)
+    engine = ForestEngine.load(artifact_path)
+    with timed(results, 'predict_engine', len(X)):
+        engine.predict_proba(X)
+
+    return results
+
+def compare_results(stages, baseline_stages, threshold=DEFAULT_THRESHOLD):
+    """Print each stage's change in time per item; returns the regressed stages"""
+    regressions = []
+    print(f"\n{'stage':<18} {'s/1k items':>11} {'baseline':>10} {'change':>8}")
+    for name, stage in stages.items():
+        base = baseline_stages.get(name)
+        per_item = stage['seconds'] / stage['items'] * 1000
+        if not base:
+            print(f"{name:<18} {per_item:>11.4f} {'-':>10} {'':>8}")
+            continue
+        base_per_item = base['seconds'] / base['items'] * 1000
+        change = per_item / base_per_item - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<18} {per_item:>11.4f} {base_per_item:>10.4f} {change:>+7.0%}{flag}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every pipeline stage on synthetic teams")
+    parser.add_argument('--teams', type=int, default=DEFAULT_TEAMS,
+                        help="number of synthetic teams (1k to 1M)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--output', help="results JSON (default: benchmarks/results/pipeline-<teams>-<time>.json)")
+    parser.add_argument('--baseline', metavar='JSON', help="earlier results to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="flag stages whose time per item grew by more than this fraction")
+    parser.add_argument('--workdir', help="keep the database and export here instead of a temporary directory")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='pipeline-bench-')
+    if args.workdir:
+        os.makedirs(workdir, exist_ok=True)
+        if os.path.exists(os.path.join(workdir, 'bench.db')):
+            os.remove(os.path.join(workdir, 'bench.db'))
+
+    created_at = datetime.datetime.now()
+    print(f"Pipeline benchmark: {args.teams} teams, seed {args.seed}, SQLite in {workdir}\n")
+    try:
+        stages = run_pipeline(args.teams, args.seed, workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"pipeline-{args.teams}-{created_at:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'benchmark': 'pipeline',
+            'created_at': created_at.isoformat(timespec='seconds'),
+            'teams': args.teams,
+            'seed': args.seed,
+            'environment': _versions(),
+            'stages': stages
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_results(stages, baseline['stages'], args.threshold)
+        if regressions:
+            print(f"\nRegressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
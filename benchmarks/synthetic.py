@@ -0,0 +1,216 @@
+# Seeded synthetic data for benchmarks: reference rows for the pokemon,
+# moves and items tables, and Showdown team exports whose playstyles follow
+# from their Pokemon, spreads, moves and items, so the classifier has
+# something to learn. The same seed always gives the same data.
+import argparse
+import itertools
+import json
+import os
+import random
+
+DEFAULT_SEED = 42
+DEFAULT_FORMAT = 'gen9ou'
+
+TYPES = [
+    'normal', 'fire', 'water', 'grass', 'electric', 'ice', 'fighting', 'poison', 'ground',
+    'flying', 'psychic', 'bug', 'rock', 'ghost', 'dragon', 'dark', 'steel', 'fairy'
+]
+SYLLABLES = [
+    'ar', 'bo', 'cha', 'dra', 'el', 'fin', 'gar', 'ho', 'ix', 'ju', 'ka', 'lo', 'mi', 'nox',
+    'or', 'pyr', 'qua', 'ru', 'sol', 'ta', 'um', 'vex', 'wo', 'xy', 'ya', 'zel'
+]
+STAT_LABELS = ['HP', 'Atk', 'Def', 'SpA', 'SpD', 'Spe']
+
+# Per playstyle: EV spreads, natures, chance of a recovery move per
+# Pokemon, chance of a defensive item, and the base stats that make a
+# Pokemon likely to be picked
+PLAYSTYLES = {
+    'HO': {
+        'spreads': [(0, 252, 0, 0, 4, 252), (0, 0, 4, 252, 0, 252)],
+        'natures': ['Jolly', 'Timid', 'Adamant', 'Modest'],
+        'recovery': 0.05, 'defensive_item': 0.1,
+        'favours': ['base_attack', 'base_sp_attack', 'base_speed']
+    },
+    'Offense': {
+        'spreads': [(0, 252, 0, 0, 4, 252), (0, 0, 4, 252, 0, 252), (252, 252, 0, 0, 4, 0)],
+        'natures': ['Jolly', 'Timid', 'Adamant', 'Modest', 'Naive'],
+        'recovery': 0.15, 'defensive_item': 0.2,
+        'favours': ['base_attack', 'base_speed']
+    },
+    'Balance': {
+        'spreads': [(252, 0, 4, 0, 252, 0), (252, 252, 4, 0, 0, 0), (248, 0, 252, 0, 8, 0)],
+        'natures': ['Careful', 'Impish', 'Adamant', 'Bold', 'Calm'],
+        'recovery': 0.35, 'defensive_item': 0.5,
+        'favours': ['base_hp', 'base_defense', 'base_attack']
+    },
+    'Stall': {
+        'spreads': [(252, 0, 252, 0, 4, 0), (252, 0, 4, 0, 252, 0)],
+        'natures': ['Bold', 'Impish', 'Calm', 'Careful', 'Relaxed', 'Sassy'],
+        'recovery': 0.7, 'defensive_item': 0.85,
+        'favours': ['base_hp', 'base_defense', 'base_sp_defense']
+    },
+    'Rain': {
+        'spreads': [(0, 0, 4, 252, 0, 252), (252, 0, 0, 252, 4, 0)],
+        'natures': ['Modest', 'Timid', 'Calm'],
+        'recovery': 0.2, 'defensive_item': 0.3,
+        'favours': ['base_sp_attack', 'base_speed']
+    }
+}
+
+def _names(rng, count, parts):
+    """``count`` distinct made-up names of ``parts`` syllables each"""
+    names = []
+    seen = set()
+    while len(names) < count:
+        name = ''.join(rng.choice(SYLLABLES) for _ in range(parts)).capitalize()
+        if name in seen:
+            name = f"{name}-{len(names)}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+def generate_reference(seed=DEFAULT_SEED, n_pokemon=400, n_moves=300, n_items=120):
+    """Rows for the pokemon, moves and items tables, keyed by table name
+
+    Names are in the tables' lowercase, hyphenated form. Every 15th move
+    heals and every 6th item is defensive.
+    """
+    rng = random.Random(seed)
+    pokemon = []
+    for name in _names(rng, n_pokemon, 3):
+        types = rng.sample(TYPES, 2)
+        pokemon.append({
+            'name': name.lower(),
+            'type1': types[0],
+            'type2': types[1] if rng.random() < 0.6 else None,
+            **{column: rng.randint(30, 150) for column in (
+                'base_hp', 'base_attack', 'base_defense',
+                'base_sp_attack', 'base_sp_defense', 'base_speed'
+            )}
+        })
+
+    moves = []
+    for i, name in enumerate(_names(rng, n_moves, 2)):
+        category = rng.choice(['Physical', 'Special', 'Status'])
+        moves.append({
+            'name': f"{name.lower()}-{rng.choice(['strike', 'beam', 'wave', 'guard', 'dance'])}",
+            'type': rng.choice(TYPES),
+            'category': category,
+            'power': None if category == 'Status' else rng.randrange(40, 130, 5),
+            'accuracy': rng.choice([None, 70, 80, 90, 100, 100, 100]),
+            'pp': rng.choice([5, 10, 15, 20]),
+            'is_recovery': i % 15 == 0,
+            'is_hazard': i % 25 == 1
+        })
+
+    items = [{
+        'item_name': f"{name.lower()}-{rng.choice(['orb', 'band', 'berry', 'boots', 'scarf'])}",
+        'is_defensive': i % 6 == 0
+    } for i, name in enumerate(_names(rng, n_items, 2))]
+
+    return {'pokemon': pokemon, 'moves': moves, 'items': items}
+
+def _display_name(name):
+    """Showdown spelling of a table name: hyphens kept, words capitalized"""
+    return '-'.join(part.capitalize() for part in name.split('-'))
+
+def _move_display_name(name):
+    # Moves are written with spaces, which lookups turn back into hyphens
+    return ' '.join(part.capitalize() for part in name.split('-'))
+
+def _style_weights(pokemon, favours):
+    """Cumulative selection weights: a Pokemon's favoured base stats, emphasized"""
+    return list(itertools.accumulate(sum(mon[column] for column in favours) ** 3 for mon in pokemon))
+
+def generate_teams(count, reference, seed=DEFAULT_SEED, format_name=DEFAULT_FORMAT):
+    """Yield ``count`` team exports, each with its ``=== [format] name~playstyle ===`` header"""
+    rng = random.Random(seed + 1)
+    pokemon = reference['pokemon']
+    recovery = [move for move in reference['moves'] if move['is_recovery']]
+    other_moves = [move for move in reference['moves'] if not move['is_recovery']]
+    defensive = [item for item in reference['items'] if item['is_defensive']]
+    other_items = [item for item in reference['items'] if not item['is_defensive']]
+    weights = {style: _style_weights(pokemon, spec['favours']) for style, spec in PLAYSTYLES.items()}
+    styles = list(PLAYSTYLES)
+
+    for i in range(count):
+        style = rng.choice(styles)
+        spec = PLAYSTYLES[style]
+        lines = [f"=== [{format_name}] Synthetic {i}~{style} ===", ""]
+        team = set()
+        while len(team) < 6:
+            team.add(rng.choices(range(len(pokemon)), cum_weights=weights[style])[0])
+
+        for index in team:
+            name = _display_name(pokemon[index]['name'])
+            if rng.random() < 0.1:
+                name = f"{rng.choice(SYLLABLES).capitalize()} ({name})"
+            elif rng.random() < 0.3:
+                name = f"{name} ({rng.choice('MF')})"
+            item = rng.choice(defensive if rng.random() < spec['defensive_item'] else other_items)
+            lines.append(f"{name} @ {_display_name(item['item_name'])}  ")
+            lines.append(f"Ability: {rng.choice(SYLLABLES).capitalize()} Aura  ")
+            lines.append(f"Tera Type: {rng.choice(TYPES).capitalize()}  ")
+
+            spread = rng.choice(spec['spreads'])
+            lines.append("EVs: " + " / ".join(
+                f"{ev} {label}" for ev, label in zip(spread, STAT_LABELS) if ev
+            ) + "  ")
+            lines.append(f"{rng.choice(spec['natures'])} Nature  ")
+            if spread[1] == 0 and rng.random() < 0.5:
+                lines.append("IVs: 0 Atk  ")
+
+            moves = rng.sample(other_moves, 4)
+            if rng.random() < spec['recovery']:
+                moves[rng.randrange(4)] = rng.choice(recovery)
+            lines.extend(f"- {_move_display_name(move['name'])}  " for move in moves)
+            lines.append("")
+
+        yield '\n'.join(lines) + '\n'
+
+def write_teams(path, count, reference, seed=DEFAULT_SEED, format_name=DEFAULT_FORMAT):
+    """Write ``count`` team exports to ``path``, one at a time"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for team in generate_teams(count, reference, seed, format_name):
+            f.write(team)
+
+def insert_reference(session, reference):
+    """Insert the generated reference rows into empty reference tables"""
+    from databases.database import Pokemon, Move, Item
+    from sqlalchemy import insert
+
+    for model, table in [(Pokemon, 'pokemon'), (Move, 'moves'), (Item, 'items')]:
+        session.execute(insert(model), reference[table])
+    session.commit()
+
+def reference_snapshot(reference):
+    """The reference rows as a ReferenceCache snapshot, ids numbered from 1"""
+    return {
+        'pokemon': {mon['name']: [pokemon_id] + [mon[column] for column in (
+            'base_hp', 'base_attack', 'base_defense',
+            'base_sp_attack', 'base_sp_defense', 'base_speed'
+        )] for pokemon_id, mon in enumerate(reference['pokemon'], 1)},
+        'moves': {move['name']: [move_id, move['is_recovery']]
+                  for move_id, move in enumerate(reference['moves'], 1)},
+        'items': {item['item_name']: [item_id, item['is_defensive']]
+                  for item_id, item in enumerate(reference['items'], 1)}
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic team export and reference data")
+    parser.add_argument('--teams', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--output', default='synthetic_teams.txt')
+    parser.add_argument('--reference-snapshot', metavar='PATH',
+                        help="also write the reference data as a ReferenceCache snapshot")
+    args = parser.parse_args()
+
+    reference = generate_reference(args.seed)
+    write_teams(args.output, args.teams, reference, args.seed)
+    print(f"Wrote {args.teams} teams to {args.output}")
+    if args.reference_snapshot:
+        os.makedirs(os.path.dirname(args.reference_snapshot) or '.', exist_ok=True)
+        with open(args.reference_snapshot, 'w', encoding='utf-8') as f:
+            json.dump(reference_snapshot(reference), f)
+        print(f"Wrote the reference data to {args.reference_snapshot}")
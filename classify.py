@@ -0,0 +1,106 @@
+# Command-line playstyle classification. Kept deliberately light: no
+# database, pandas or plotting imports, and the model is only loaded once
+# there is a team to classify. With the model artifact, sklearn is never
+# imported at all.
+from databases.reference_cache import ReferenceCache, DEFAULT_SNAPSHOT_PATH
+from databases.team_parser import team_features
+from model_artifact import ARTIFACT_PATH
+import argparse
+import os
+import sys
+import numpy as np
+
+DEFAULT_MODEL_PATH = 'models/random_forest_classifier.joblib'
+DEFAULT_SCALER_PATH = 'models/scaler.joblib'
+
+def load_model(model_path=DEFAULT_MODEL_PATH, scaler_path=DEFAULT_SCALER_PATH,
+               artifact_path=ARTIFACT_PATH):
+    """Load the classifier, which takes unscaled feature rows
+
+    Uses the forest engine on the model artifact when there is one at least
+    as new as the joblib model, and otherwise the joblib model and scaler as
+    a pipeline. Either has ``predict_proba`` and ``classes_``.
+    """
+    if artifact_path and os.path.exists(artifact_path) and (
+            not os.path.exists(model_path)
+            or os.path.getmtime(artifact_path) >= os.path.getmtime(model_path)):
+        from forest_engine import ForestEngine
+        return ForestEngine.load(artifact_path)
+
+    import joblib
+    from sklearn.pipeline import Pipeline
+    return Pipeline([('scaler', joblib.load(scaler_path)), ('clf', joblib.load(model_path))])
+
+def classify_teams(team_texts, model_path=DEFAULT_MODEL_PATH, scaler_path=DEFAULT_SCALER_PATH,
+                   reference_path=DEFAULT_SNAPSHOT_PATH, artifact_path=ARTIFACT_PATH):
+    """Classify Showdown team texts
+
+    Returns one ``(probabilities, warnings, error)`` tuple per team, where
+    probabilities maps playstyle to probability (None if the team could
+    not be classified).
+    """
+    reference = ReferenceCache.from_snapshot(reference_path)
+
+    results = []
+    features = []
+    for team_text in team_texts:
+        warnings = []
+        try:
+            team_vector = team_features(team_text, reference, warnings)
+            if team_vector[0] is None:
+                raise ValueError("None of the team's Pokemon were recognized")
+            features.append(team_vector)
+            results.append([None, warnings, None])
+        except Exception as e:
+            results.append([None, warnings, str(e)])
+
+    if features:
+        model = load_model(model_path, scaler_path, artifact_path)
+        probabilities = model.predict_proba(np.array(features, dtype=float))
+        rows = iter(probabilities)
+        for result in results:
+            if result[2] is None:
+                result[0] = dict(zip((str(c) for c in model.classes_), map(float, next(rows))))
+
+    return [tuple(result) for result in results]
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify the playstyle of Showdown teams")
+    parser.add_argument('files', nargs='*', help="team files, one team each (default: stdin)")
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--scaler', default=DEFAULT_SCALER_PATH)
+    parser.add_argument('--reference', default=DEFAULT_SNAPSHOT_PATH)
+    parser.add_argument('--artifact', default=ARTIFACT_PATH,
+                        help="model artifact for the forest engine ('' to use the joblib model)")
+    args = parser.parse_args()
+
+    if args.files:
+        names = args.files
+        team_texts = []
+        for path in args.files:
+            with open(path, 'r', encoding='utf-8') as f:
+                team_texts.append(f.read())
+    else:
+        names = ['<stdin>']
+        team_texts = [sys.stdin.read()]
+
+    results = classify_teams(team_texts, args.model, args.scaler, args.reference, args.artifact)
+
+    failed = False
+    for name, (probabilities, warnings, error) in zip(names, results):
+        for warning in warnings:
+            print(f"{name}: {warning}", file=sys.stderr)
+        if error:
+            print(f"{name}: error: {error}", file=sys.stderr)
+            failed = True
+            continue
+
+        ranked = sorted(probabilities.items(), key=lambda item: item[1], reverse=True)
+        print(f"{name}: {ranked[0][0]}")
+        for playstyle, probability in ranked:
+            print(f"  {playstyle:<20} {probability:.3f}")
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,55 +1,134 @@
-from sqlalchemy import func, case, select
-from database import session, Team, TeamPokemon, Move, Item
-
-def update_team_stats():
-    # Get teams that haven't been aggregated yet (where stats are None)
-    teams = session.query(Team).filter(
-        (Team.team_hp == None) |
-        (Team.team_offense == None) |
-        (Team.team_defense == None) |
-        (Team.team_spdef == None) |
-        (Team.team_speed == None) |
-        (Team.recovery_moves == None) |
-        (Team.defensive_items == None)
-    ).all()
-    
-    for team in teams:
-        team_stats = session.query(
-            func.sum(TeamPokemon.hp).label('total_hp'),
-            func.sum(TeamPokemon.defense).label('total_defense'),
-            func.sum(TeamPokemon.sp_defense).label('total_spdef'),
-            func.sum(TeamPokemon.speed).label('total_speed'),
-            func.sum(
-                func.greatest(TeamPokemon.attack, TeamPokemon.sp_attack)
-            ).label('total_offense')
-        ).filter(TeamPokemon.team_id == team.team_id).first()
-
-        recovery_moves_count = session.query(func.count(Move.move_id)).join(
-            TeamPokemon, (Move.move_id == TeamPokemon.move1_id) |
-                        (Move.move_id == TeamPokemon.move2_id) |
-                        (Move.move_id == TeamPokemon.move3_id) |
-                        (Move.move_id == TeamPokemon.move4_id)
-        ).filter(
-            TeamPokemon.team_id == team.team_id,
-            Move.is_recovery == True
-        ).scalar()
-
-        defensive_items_count = session.query(func.count(Item.item_id)).join(
-            TeamPokemon, TeamPokemon.item_id == Item.item_id
-        ).filter(
-            TeamPokemon.team_id == team.team_id,
-            Item.is_defensive == True
-        ).scalar()
-
-        team.team_hp = team_stats.total_hp
-        team.team_offense = team_stats.total_offense
-        team.team_defense = team_stats.total_defense
-        team.team_spdef = team_stats.total_spdef
-        team.team_speed = team_stats.total_speed
-        team.recovery_moves = recovery_moves_count
-        team.defensive_items = defensive_items_count
-
-    session.commit()
+from sqlalchemy import func, case, or_, update
+from databases.database import Session, Team, TeamPokemon, Move, Item, engine
+from databases.instrumentation import metrics, DEFAULT_METRICS_PATH
+import argparse
+
+DEFAULT_CHUNK_SIZE = 1000
+
+def pending_teams_filter():
+    """Teams that haven't been aggregated yet
+
+    Aggregating always sets recovery_moves (a count), while the stat sums
+    stay None for a team without recognized Pokemon, so recovery_moves
+    alone marks the pending teams. With the (recovery_moves, team_id)
+    index from migration 4, update_team_stats reads only those.
+    """
+    return Team.recovery_moves == None
+
+def compute_team_aggregates(session, team_ids):
+    """Compute the aggregate columns for a set of teams
+
+    Uses one GROUP BY query each for the stat sums, recovery moves and
+    defensive items, whatever the number of teams. Returns a dict of
+    team_id -> column values.
+    """
+    # Portable GREATEST(attack, sp_attack)
+    offense = case(
+        (TeamPokemon.attack >= TeamPokemon.sp_attack, TeamPokemon.attack),
+        else_=TeamPokemon.sp_attack
+    )
+    stat_rows = session.query(
+        TeamPokemon.team_id,
+        func.sum(TeamPokemon.hp),
+        func.sum(offense),
+        func.sum(TeamPokemon.defense),
+        func.sum(TeamPokemon.sp_defense),
+        func.sum(TeamPokemon.speed)
+    ).filter(
+        TeamPokemon.team_id.in_(team_ids)
+    ).group_by(TeamPokemon.team_id).all()
+
+    recovery_rows = session.query(
+        TeamPokemon.team_id, func.count(Move.move_id)
+    ).join(
+        Move, or_(Move.move_id == TeamPokemon.move1_id,
+                  Move.move_id == TeamPokemon.move2_id,
+                  Move.move_id == TeamPokemon.move3_id,
+                  Move.move_id == TeamPokemon.move4_id)
+    ).filter(
+        TeamPokemon.team_id.in_(team_ids),
+        Move.is_recovery == True
+    ).group_by(TeamPokemon.team_id).all()
+
+    defensive_rows = session.query(
+        TeamPokemon.team_id, func.count(Item.item_id)
+    ).join(
+        Item, TeamPokemon.item_id == Item.item_id
+    ).filter(
+        TeamPokemon.team_id.in_(team_ids),
+        Item.is_defensive == True
+    ).group_by(TeamPokemon.team_id).all()
+
+    recovery = dict(recovery_rows)
+    defensive = dict(defensive_rows)
+    sums = {row[0]: row[1:] for row in stat_rows}
+
+    aggregates = {}
+    for team_id in team_ids:
+        # Teams without any team_pokemon rows get NULL sums, as before
+        hp, offense_total, defense, spdef, speed = sums.get(team_id, (None,) * 5)
+        aggregates[team_id] = {
+            'team_hp': hp,
+            'team_offense': offense_total,
+            'team_defense': defense,
+            'team_spdef': spdef,
+            'team_speed': speed,
+            'recovery_moves': recovery.get(team_id, 0),
+            'defensive_items': defensive.get(team_id, 0)
+        }
+    return aggregates
+
+@metrics.timed('aggregate')
+def update_team_stats(chunk_size=DEFAULT_CHUNK_SIZE):
+    """Fill in the aggregate columns of every team that is missing them
+
+    Pending teams are walked in team_id order, ``chunk_size`` at a time,
+    and each chunk is committed on its own, so the work done is
+    proportional to the number of new teams and an interrupted run can
+    simply be restarted.
+    """
+    session = Session()
+    updated = 0
+    last_team_id = 0
+    try:
+        while True:
+            team_ids = [team_id for (team_id,) in session.query(Team.team_id).filter(
+                pending_teams_filter(),
+                Team.team_id > last_team_id
+            ).order_by(Team.team_id).limit(chunk_size)]
+            if not team_ids:
+                break
+
+            aggregates = compute_team_aggregates(session, team_ids)
+            session.execute(update(Team), [
+                {'team_id': team_id, **values} for team_id, values in aggregates.items()
+            ])
+            session.commit()
+
+            updated += len(team_ids)
+            metrics.count('aggregate', len(team_ids))
+            last_team_id = team_ids[-1]
+            print(f"Aggregated {updated} teams")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+    return updated
 
 if __name__ == "__main__":
-    update_team_stats()
+    parser = argparse.ArgumentParser(description="Aggregate team stats for teams that are missing them")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--metrics', nargs='?', const=DEFAULT_METRICS_PATH, metavar='PATH',
+                        help="write stage timings and database round trips to PATH (JSON) and .prom")
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable(args.metrics, engine)
+    else:
+        metrics.enable_from_env(engine)
+    try:
+        update_team_stats(args.chunk_size)
+    finally:
+        metrics.write()
@@ -0,0 +1,137 @@
+from databases.database import Session, Team, TeamPokemon
+from databases.team_parser import prepare_teams
+from databases.reference_cache import refresh_reference_cache
+from databases.instrumentation import metrics
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from itertools import islice
+import time
+
+DEFAULT_BATCH_SIZE = 500
+
+def load_team_hashes(session=None):
+    """Set of the team_hash of every team already in the database"""
+    own_session = session is None
+    session = session or Session()
+    try:
+        return set(session.execute(
+            select(Team.team_hash).where(Team.team_hash.isnot(None))
+        ).scalars())
+    finally:
+        if own_session:
+            session.close()
+
+def drop_duplicates(prepared, known_hashes, batch_hashes=None):
+    """Remove teams whose hash is in ``known_hashes`` or repeats within the batch
+
+    Returns ``(unique, duplicates)``: the prepared teams to insert and how
+    many were dropped. ``known_hashes`` is left as is; insert_batch adds
+    the teams it stores. The hashes kept are added to ``batch_hashes``, for
+    a batch built from several calls.
+    """
+    batch_hashes = set() if batch_hashes is None else batch_hashes
+    unique = []
+    for entry in prepared:
+        team_hash = entry[1]['team_hash']
+        if team_hash in known_hashes or team_hash in batch_hashes:
+            continue
+        batch_hashes.add(team_hash)
+        unique.append(entry)
+    return unique, len(prepared) - len(unique)
+
+def _insert_rows(session, prepared):
+    """Insert the teams rows, then every team_pokemon row in one executemany"""
+    pokemon_rows = []
+    for _, team_row, rows in prepared:
+        # One INSERT per team: MySQL has no RETURNING, so the generated ids
+        # of a multi-row insert are not reliably known
+        result = session.execute(insert(Team.__table__), team_row)
+        team_id = result.inserted_primary_key[0]
+        pokemon_rows.extend(dict(row, team_id=team_id) for row in rows)
+
+    if pokemon_rows:
+        session.execute(insert(TeamPokemon.__table__), pokemon_rows)
+
+def insert_batch(session, prepared, quarantine, known_hashes=None):
+    """Insert a batch of prepared teams in a single transaction
+
+    If the batch fails it is retried team by team inside savepoints, so one
+    bad team is quarantined instead of losing the whole batch. The hashes
+    of the teams inserted are added to ``known_hashes``, if given. Returns
+    the number of teams inserted.
+    """
+    try:
+        _insert_rows(session, prepared)
+        session.commit()
+        inserted = prepared
+    except SQLAlchemyError as e:
+        session.rollback()
+        print(f"Batch insert failed, isolating bad teams: {e}")
+
+        inserted = []
+        for entry in prepared:
+            try:
+                with session.begin_nested():
+                    _insert_rows(session, [entry])
+                inserted.append(entry)
+            except SQLAlchemyError as e:
+                team = entry[0]
+                quarantine.append({
+                    'format': team['format'],
+                    'team_name': team['team_name'],
+                    'error': str(e)
+                })
+        session.commit()
+
+    if known_hashes is not None:
+        known_hashes.update(team_row['team_hash'] for _, team_row, _ in inserted)
+    return len(inserted)
+
+def process_teams_bulk(teams, batch_size=DEFAULT_BATCH_SIZE, aggregate=False):
+    """Ingest teams in batches, one transaction per batch
+
+    ``teams`` is any iterable of split_teams records. With
+    ``aggregate=True`` team aggregates are computed at ingest. Teams already
+    in the database, or earlier in ``teams``, are skipped. Returns
+    ``(inserted, quarantine)`` where quarantine lists the teams that failed
+    and why.
+    """
+    reference = refresh_reference_cache()
+    print(f"Loaded reference data: {reference}")
+
+    quarantine = []
+    inserted = 0
+    duplicates = 0
+    start = time.perf_counter()
+
+    session = Session()
+    try:
+        known_hashes = load_team_hashes(session)
+        teams = iter(teams)
+        while True:
+            batch = list(islice(teams, batch_size))
+            if not batch:
+                break
+            timings = {} if metrics.enabled else None
+            prepared = prepare_teams(batch, reference, quarantine, aggregate=aggregate,
+                                     timings=timings)
+            metrics.add_timings('ingest', timings)
+            prepared, skipped = drop_duplicates(prepared, known_hashes)
+            duplicates += skipped
+            with metrics.stage('ingest.db', len(prepared)):
+                inserted += insert_batch(session, prepared, quarantine, known_hashes)
+
+            elapsed = time.perf_counter() - start
+            print(f"Inserted {inserted} teams ({inserted / elapsed:.0f} teams/sec)")
+    finally:
+        session.close()
+
+    elapsed = time.perf_counter() - start
+    rate = inserted / elapsed if elapsed > 0 else 0.0
+    print(f"\nBulk ingest finished: {inserted} teams in {elapsed:.1f}s "
+          f"({rate:.0f} teams/sec), {duplicates} duplicates skipped, "
+          f"{len(quarantine)} quarantined")
+    for team in quarantine:
+        print(f"Quarantined [{team['format']}] {team['team_name']}: {team['error']}")
+
+    return inserted, quarantine
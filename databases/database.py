@@ -8,8 +8,9 @@ import os
 # Load environment variables from .env file
 load_dotenv()
 
-# Construct database URL from environment variables
-database_url = f"mysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+# Construct database URL from environment variables; DATABASE_URL, if set,
+# replaces it (e.g. sqlite:///bench.db for the benchmarks)
+database_url = os.getenv('DATABASE_URL') or f"mysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 
 engine = create_engine(database_url)
 
@@ -21,6 +22,9 @@ class Team(Base):
     team_id = Column(Integer, primary_key=True)
     team_name = Column(String(100))
     playstyle = Column(String(100))
+    # team_parser.team_hash of the team's canonical form; NULL for teams
+    # ingested before it was recorded
+    team_hash = Column(String(64), unique=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     team_hp = Column(Integer, nullable=True)
     team_offense = Column(Integer, nullable=True)
@@ -36,7 +40,7 @@ class Pokemon(Base):
     __tablename__ = 'pokemon'
     
     pokemon_id = Column(Integer, primary_key=True)
-    name = Column(String(100), nullable=False)
+    name = Column(String(100), nullable=False, unique=True)
     type1 = Column(String(20), nullable=False)
     type2 = Column(String(20))
     base_hp = Column(Integer, nullable=False)
@@ -52,7 +56,7 @@ class Move(Base):
     __tablename__ = 'moves'
     
     move_id = Column(Integer, primary_key=True)
-    name = Column(String(100), nullable=False)
+    name = Column(String(100), nullable=False, unique=True)
     type = Column(String(20), nullable=False)
     category = Column(String(20))  # Physical, Special, or Status
     power = Column(Integer)
@@ -65,7 +69,7 @@ class TeamPokemon(Base):
     __tablename__ = 'team_pokemon'
     
     team_pokemon_id = Column(Integer, primary_key=True)
-    team_id = Column(Integer, ForeignKey('teams.team_id'))
+    team_id = Column(Integer, ForeignKey('teams.team_id'), index=True)
     pokemon_id = Column(Integer, ForeignKey('pokemon.pokemon_id'))
     move1_id = Column(Integer, ForeignKey('moves.move_id'))
     move2_id = Column(Integer, ForeignKey('moves.move_id'))
@@ -92,7 +96,7 @@ class Item(Base):
     __tablename__ = 'items'
     
     item_id = Column(Integer, primary_key=True)
-    item_name = Column(String(100), nullable=False)
+    item_name = Column(String(100), nullable=False, unique=True)
     is_defensive = Column(Boolean, default=False)
 
 Base.metadata.create_all(engine)
@@ -100,13 +104,14 @@ Base.metadata.create_all(engine)
 Session = sessionmaker(bind=engine)
 session = Session()
 
-new_user = Team(team_name='Team Sandy')
-session.add(new_user)
-session.commit()
+if __name__ == "__main__":
+    new_user = Team(team_name='Team Sandy')
+    session.add(new_user)
+    session.commit()
 
-all_users = session.query(Team).all()
+    all_users = session.query(Team).all()
 
-user = session.query(Team).filter_by(team_name='Team Sandy').first()
-print(user)
+    user = session.query(Team).filter_by(team_name='Team Sandy').first()
+    print(user)
 
-session.close()
\ No newline at end of file
+    session.close()
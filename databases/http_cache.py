@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+class ResponseCache:
+    """On-disk cache of successful GET responses, one JSON file per URL
+
+    Files are named by the SHA-256 of the URL and keep the body together
+    with its ETag/Last-Modified validators and the time it was fetched.
+    """
+
+    def __init__(self, directory, ttl):
+        self.directory = directory
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stale': 0}
+
+    def _path(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, url):
+        """Return the cached entry for ``url``, or None"""
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url, body, etag=None, last_modified=None):
+        """Store a response body, replacing any previous entry atomically"""
+        entry = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': time.time(),
+            'body': body
+        }
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        return entry
+
+    def touch(self, entry):
+        """Mark an entry as freshly revalidated (after a 304)"""
+        return self.put(entry['url'], entry['body'], entry['etag'], entry['last_modified'])
+
+    def is_fresh(self, entry):
+        return time.time() - entry['fetched_at'] < self.ttl
+
+    def validators(self, entry):
+        """Conditional request headers for revalidating an entry"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def summary(self):
+        stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses'] + stats['revalidated'] + stats['stale']
+        served = lookups - stats['misses']
+        hit_rate = served / lookups * 100 if lookups else 0.0
+        return (f"HTTP cache: {stats['hits']} hits, {stats['revalidated']} revalidated, "
+                f"{stats['stale']} stale (offline), {stats['misses']} misses "
+                f"({hit_rate:.0f}% served from cache)")
@@ -0,0 +1,134 @@
+from databases.database import Session
+from databases.team_parser import prepare_teams
+from databases.reference_cache import refresh_reference_cache
+from databases.bulk_ingest import insert_batch, load_team_hashes, drop_duplicates, DEFAULT_BATCH_SIZE
+from databases.instrumentation import metrics, carry_stages
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+from queue import Queue
+from threading import Thread
+import os
+import time
+
+DEFAULT_CHUNK_SIZE = 100
+
+# Reference data handed to each worker once by the pool initializer
+_worker_reference = None
+
+def _init_worker(reference):
+    global _worker_reference
+    _worker_reference = reference
+
+def _prepare_chunk(chunk, aggregate, timed):
+    """Worker: parse a chunk of teams and compute their rows"""
+    quarantine = []
+    warnings = []
+    timings = {} if timed else None
+    prepared = prepare_teams(chunk, _worker_reference, quarantine, warnings, aggregate, timings)
+    return prepared, quarantine, warnings, timings
+
+def _chunks(teams, size):
+    teams = iter(teams)
+    while True:
+        chunk = list(islice(teams, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _write_batches(results, batch_size, stats):
+    """Writer stage: insert prepared chunks in input order, batch by batch"""
+    session = Session()
+    pending = []
+    pending_hashes = set()
+    try:
+        known_hashes = load_team_hashes(session)
+        while True:
+            item = results.get()
+            if item is None:
+                break
+            if stats['error'] is not None:
+                continue  # Keep draining so the producer never blocks
+
+            prepared, quarantine, warnings, timings = item
+            for warning in warnings:
+                print(warning)
+            # Worker time, so with several workers it adds up to more than
+            # the wall time of the run
+            metrics.add_timings('ingest', timings)
+            stats['quarantine'].extend(quarantine)
+            prepared, skipped = drop_duplicates(prepared, known_hashes, pending_hashes)
+            stats['duplicates'] += skipped
+            pending.extend(prepared)
+
+            try:
+                if len(pending) >= batch_size:
+                    with metrics.stage('ingest.db', len(pending)):
+                        stats['inserted'] += insert_batch(session, pending, stats['quarantine'],
+                                                          known_hashes)
+                    pending = []
+                    pending_hashes = set()
+            except Exception as e:
+                stats['error'] = e
+
+        if pending and stats['error'] is None:
+            with metrics.stage('ingest.db', len(pending)):
+                stats['inserted'] += insert_batch(session, pending, stats['quarantine'], known_hashes)
+    except Exception as e:
+        stats['error'] = e
+    finally:
+        session.close()
+
+def process_teams_pipeline(teams, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                           batch_size=DEFAULT_BATCH_SIZE, queue_size=None,
+                           aggregate=False):
+    """Ingest teams with parsing fanned out to a process pool
+
+    Workers parse teams and compute their stats; finished chunks go through
+    a bounded queue to a single writer thread that inserts them with
+    insert_batch. Chunks are handed to the writer in input order, so teams
+    are inserted, and warnings printed, exactly as if run serially. With
+    ``aggregate=True`` workers also compute the team aggregates. Teams
+    already in the database are skipped by the writer. Returns
+    ``(inserted, quarantine)``.
+    """
+    workers = workers or os.cpu_count() or 1
+    queue_size = queue_size or workers * 2
+
+    reference = refresh_reference_cache()
+    print(f"Loaded reference data: {reference}")
+
+    stats = {'inserted': 0, 'duplicates': 0, 'quarantine': [], 'error': None}
+    results = Queue(maxsize=queue_size)
+    writer = Thread(target=carry_stages(_write_batches), args=(results, batch_size, stats))
+    start = time.perf_counter()
+    writer.start()
+
+    try:
+        with Pool(workers, initializer=_init_worker, initargs=(reference,)) as pool:
+            # At most queue_size chunks are in flight, so memory stays bounded
+            # however large the input is
+            in_flight = deque()
+            for chunk in _chunks(teams, chunk_size):
+                in_flight.append(pool.apply_async(_prepare_chunk, (chunk, aggregate, metrics.enabled)))
+                if len(in_flight) >= queue_size:
+                    results.put(in_flight.popleft().get())
+            while in_flight:
+                results.put(in_flight.popleft().get())
+    finally:
+        results.put(None)
+        writer.join()
+
+    if stats['error'] is not None:
+        raise stats['error']
+
+    inserted, quarantine = stats['inserted'], stats['quarantine']
+    elapsed = time.perf_counter() - start
+    rate = inserted / elapsed if elapsed > 0 else 0.0
+    print(f"\nPipeline ingest finished with {workers} workers: {inserted} teams "
+          f"in {elapsed:.1f}s ({rate:.0f} teams/sec), {stats['duplicates']} duplicates skipped, "
+          f"{len(quarantine)} quarantined")
+    for team in quarantine:
+        print(f"Quarantined [{team['format']}] {team['team_name']}: {team['error']}")
+
+    return inserted, quarantine
@@ -0,0 +1,244 @@
+# Run metrics: wall time and items per stage, and the database statements
+# and round-trip time spent inside each, written as JSON and Prometheus text.
+# Off unless enabled (METRICS_ENV, or a script's --metrics flag). While off,
+# stage() hands back one shared no-op context manager and no engine events
+# are attached, so instrumented code costs a function call at most.
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+
+METRICS_ENV = 'PIPELINE_METRICS'
+# Scripts run by one instrumented run share its id, and so one metrics file
+RUN_ENV = 'PIPELINE_METRICS_RUN'
+DEFAULT_METRICS_PATH = 'models/metrics.json'
+
+STAGE_FIELDS = ['calls', 'seconds', 'items', 'statements', 'db_seconds']
+
+_NO_STAGE = contextlib.nullcontext()
+
+# Names of the stages open in the current thread (or context), outermost first
+_OPEN_STAGES = contextvars.ContextVar('open_stages', default=())
+
+def _new_stage():
+    return dict.fromkeys(STAGE_FIELDS, 0)
+
+class Metrics:
+    """Per-stage timings and database round trips for one process
+
+    Stages are named by dotted paths such as ``ingest.db``. A statement is
+    counted in every stage open in the thread that ran it, so the totals of
+    ``ingest`` include those of ``ingest.db`` but not those of a stage
+    running at the same time in another thread. A thread started with a
+    carry_stages() target also counts towards the stages open where it was
+    started.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.run_id = None
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._engines = []
+
+    def enable(self, path=DEFAULT_METRICS_PATH, engine=None):
+        """Start recording, to be written to ``path``
+
+        The path and run id are exported to the environment, so scripts
+        this process runs add their metrics to the same file.
+        """
+        self.enabled = True
+        self.path = path
+        self.run_id = os.environ.get(RUN_ENV) if os.environ.get(METRICS_ENV) == path else None
+        self.run_id = self.run_id or uuid.uuid4().hex
+        os.environ[METRICS_ENV] = path
+        os.environ[RUN_ENV] = self.run_id
+        if engine is not None:
+            self.watch(engine)
+        return self
+
+    def enable_from_env(self, engine=None):
+        """Enable if METRICS_ENV names a metrics file; returns whether enabled"""
+        path = os.environ.get(METRICS_ENV)
+        if path:
+            self.enable(path, engine)
+        return self.enabled
+
+    def watch(self, engine):
+        """Count the statements run on ``engine`` (only while enabled)"""
+        if not self.enabled or any(watched is engine for watched in self._engines):
+            return
+        from sqlalchemy import event
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        self._engines.append(engine)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info['metrics_started'].pop()
+        with self._lock:
+            for name in dict.fromkeys(_OPEN_STAGES.get()):
+                stage = self.stages.setdefault(name, _new_stage())
+                stage['statements'] += 1
+                stage['db_seconds'] += seconds
+
+    def stage(self, name, items=0):
+        """Context manager timing a stage that processes ``items`` items"""
+        if not self.enabled:
+            return _NO_STAGE
+        return self._timed(name, items)
+
+    @contextlib.contextmanager
+    def _timed(self, name, items):
+        token = _OPEN_STAGES.set(_OPEN_STAGES.get() + (name,))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            _OPEN_STAGES.reset(token)
+            with self._lock:
+                stage = self.stages.setdefault(name, _new_stage())
+                stage['calls'] += 1
+                stage['seconds'] += seconds
+                stage['items'] += items
+
+    def timed(self, name):
+        """Decorator running each call of the function as stage ``name``"""
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def add(self, name, seconds=0.0, items=0, calls=1):
+        """Record time measured elsewhere, e.g. in a worker process"""
+        if not self.enabled:
+            return
+        with self._lock:
+            stage = self.stages.setdefault(name, _new_stage())
+            stage['calls'] += calls
+            stage['seconds'] += seconds
+            stage['items'] += items
+
+    def add_timings(self, prefix, timings):
+        """add() each ``name: seconds`` of ``timings`` as stage ``prefix.name``"""
+        for name, seconds in (timings or {}).items():
+            self.add(f"{prefix}.{name}", seconds)
+
+    def count(self, name, items):
+        """Add to a stage's item count, for items only known after it ran"""
+        self.add(name, items=items, calls=0)
+
+    def counted(self, name, iterable):
+        """Pass ``iterable`` through, counting its items as stage ``name``'s"""
+        if not self.enabled:
+            return iterable
+        return self._counted(name, iterable)
+
+    def _counted(self, name, iterable):
+        for item in iterable:
+            self.count(name, 1)
+            yield item
+
+    def _merged(self):
+        """This process's stages added to those already written by its run"""
+        stages = {name: dict(values) for name, values in self.stages.items()}
+        try:
+            with open(self.path, 'r') as f:
+                written = json.load(f)
+        except (FileNotFoundError, ValueError):
+            written = {}
+        if written.get('run_id') != self.run_id:
+            return stages, time.time()
+        for name, values in written.get('stages', {}).items():
+            stage = stages.setdefault(name, _new_stage())
+            for field in STAGE_FIELDS:
+                stage[field] += values.get(field, 0)
+        return stages, written.get('started_at', time.time())
+
+    def write(self):
+        """Write the run's metrics to ``path`` and Prometheus text next to it
+
+        Each stage also gets per-item figures (seconds, statements and
+        database milliseconds per item) and its throughput. Does nothing
+        while disabled. Returns the paths written.
+        """
+        if not self.enabled:
+            return []
+        with self._lock:
+            stages, started_at = self._merged()
+
+        report = {}
+        for name, stage in sorted(stages.items()):
+            entry = dict(stage)
+            if stage['items']:
+                entry['seconds_per_item'] = stage['seconds'] / stage['items']
+                entry['statements_per_item'] = stage['statements'] / stage['items']
+                entry['db_ms_per_item'] = stage['db_seconds'] * 1000 / stage['items']
+                entry['items_per_second'] = stage['items'] / stage['seconds'] if stage['seconds'] else None
+            report[name] = entry
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        prom_path = os.path.splitext(self.path)[0] + '.prom'
+        for path, content in [
+            (self.path, json.dumps({'run_id': self.run_id, 'started_at': started_at,
+                                    'updated_at': time.time(), 'stages': report}, indent=2)),
+            (prom_path, prometheus_text(report))
+        ]:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return [self.path, prom_path]
+
+    def summary(self):
+        """Print the run's stages so far (call before write()) as a table"""
+        if not self.enabled:
+            return
+        with self._lock:
+            stages, _ = self._merged()
+        print(f"\n{'stage':<28} {'seconds':>9} {'items':>9} {'items/s':>9} "
+              f"{'statements':>11} {'db s':>8}")
+        for name, stage in sorted(stages.items()):
+            rate = stage['items'] / stage['seconds'] if stage['items'] and stage['seconds'] else 0
+            print(f"{name:<28} {stage['seconds']:>9.2f} {stage['items']:>9} {rate:>9.0f} "
+                  f"{stage['statements']:>11} {stage['db_seconds']:>8.2f}")
+
+def carry_stages(target):
+    """``target``, to run in a thread as part of the stages open here
+
+    Statements the thread runs are counted in those stages as well as in
+    the ones it opens itself.
+    """
+    return functools.partial(contextvars.copy_context().run, target)
+
+PROMETHEUS_METRICS = [
+    ('seconds', 'pipeline_stage_seconds_total', 'Wall-clock seconds spent in the stage'),
+    ('calls', 'pipeline_stage_calls_total', 'Times the stage ran'),
+    ('items', 'pipeline_stage_items_total', 'Items (teams, rows) the stage processed'),
+    ('statements', 'pipeline_stage_db_statements_total', 'Database statements run during the stage'),
+    ('db_seconds', 'pipeline_stage_db_seconds_total', 'Seconds spent in database round trips during the stage')
+]
+
+def prometheus_text(stages):
+    """Stage metrics in the Prometheus text exposition format"""
+    lines = []
+    for field, metric, description in PROMETHEUS_METRICS:
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} counter")
+        for name, stage in stages.items():
+            lines.append(f'{metric}{{stage="{name}"}} {stage[field]}')
+    return '\n'.join(lines) + '\n'
+
+# The process-wide instance the pipeline scripts record into
+metrics = Metrics()
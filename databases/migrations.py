@@ -0,0 +1,159 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index, bindparam, inspect, select, update, delete, text
+from databases.database import engine, Base, Session, Pokemon, Move, Item, Team, TeamPokemon
+import argparse
+import datetime
+import sys
+
+class SchemaMigration(Base):
+    __tablename__ = 'schema_migrations'
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String(200), nullable=False)
+    applied_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+# Reference tables: (model, primary key, unique name column, team_pokemon columns referencing it)
+REFERENCE_TABLES = [
+    (Pokemon, 'pokemon_id', 'name', ['pokemon_id']),
+    (Move, 'move_id', 'name', ['move1_id', 'move2_id', 'move3_id', 'move4_id']),
+    (Item, 'item_id', 'item_name', ['item_id'])
+]
+
+def _has_index(conn, table_name, columns, unique=False):
+    """Whether an index (or unique constraint) starts with ``columns``"""
+    inspector = inspect(conn)
+    candidates = [
+        (index['column_names'], index.get('unique', False))
+        for index in inspector.get_indexes(table_name)
+    ]
+    candidates += [
+        (constraint['column_names'], True)
+        for constraint in inspector.get_unique_constraints(table_name)
+    ]
+    for index_columns, index_unique in candidates:
+        if unique and (not index_unique or list(index_columns) != list(columns)):
+            continue
+        if list(index_columns[:len(columns)]) == list(columns):
+            return True
+    return False
+
+def _deduplicate(conn, model, pk, name_column, fk_columns):
+    """Keep the lowest id per name, repoint team_pokemon rows at it and delete the rest"""
+    table = model.__table__
+    team_pokemon = TeamPokemon.__table__
+
+    keep = {}
+    duplicates = {}
+    for row_id, name in conn.execute(
+        select(table.c[pk], table.c[name_column]).order_by(table.c[pk])
+    ):
+        if name in keep:
+            duplicates[row_id] = keep[name]
+        else:
+            keep[name] = row_id
+
+    if not duplicates:
+        return 0
+
+    for fk in fk_columns:
+        conn.execute(
+            update(team_pokemon).where(team_pokemon.c[fk] == bindparam('old_id')).values({fk: bindparam('new_id')}),
+            [{'old_id': old_id, 'new_id': new_id} for old_id, new_id in duplicates.items()]
+        )
+    duplicate_ids = list(duplicates)
+    for i in range(0, len(duplicate_ids), 1000):
+        conn.execute(delete(table).where(table.c[pk].in_(duplicate_ids[i:i + 1000])))
+    return len(duplicates)
+
+def unique_reference_names(conn):
+    for model, pk, name_column, fk_columns in REFERENCE_TABLES:
+        table_name = model.__tablename__
+        if _has_index(conn, table_name, [name_column], unique=True):
+            continue
+        removed = _deduplicate(conn, model, pk, name_column, fk_columns)
+        print(f"Removed {removed} duplicate rows from {table_name}")
+        Index(f"uq_{table_name}_{name_column}", model.__table__.c[name_column], unique=True).create(conn)
+        print(f"Added unique index on {table_name}.{name_column}")
+
+def index_team_pokemon_team_id(conn):
+    if not _has_index(conn, 'team_pokemon', ['team_id']):
+        Index('ix_team_pokemon_team_id', TeamPokemon.__table__.c.team_id).create(conn)
+        print("Added index on team_pokemon.team_id")
+
+def add_team_hash(conn):
+    # Existing teams keep a NULL hash: it is computed from the team text,
+    # which the tables don't keep
+    if 'team_hash' not in {column['name'] for column in inspect(conn).get_columns('teams')}:
+        conn.execute(text("ALTER TABLE teams ADD COLUMN team_hash VARCHAR(64)"))
+        print("Added teams.team_hash")
+    if not _has_index(conn, 'teams', ['team_hash'], unique=True):
+        Index('uq_teams_team_hash', Team.__table__.c.team_hash, unique=True).create(conn)
+        print("Added unique index on teams.team_hash")
+
+def index_pending_teams(conn):
+    # aggregate_stats.pending_teams_filter, walked in team_id order
+    if not _has_index(conn, 'teams', ['recovery_moves', 'team_id']):
+        Index('ix_teams_recovery_moves_team_id', Team.__table__.c.recovery_moves,
+              Team.__table__.c.team_id).create(conn)
+        print("Added index on teams (recovery_moves, team_id)")
+
+# Append new migrations at the end; versions must never be reused
+MIGRATIONS = [
+    (1, "De-duplicate pokemon, moves and items; unique name keys", unique_reference_names),
+    (2, "Index team_pokemon.team_id", index_team_pokemon_team_id),
+    (3, "Content hash on teams for duplicate detection", add_team_hash),
+    (4, "Index the teams still to aggregate", index_pending_teams),
+]
+
+def pending_migrations():
+    """The MIGRATIONS not yet applied to the database"""
+    SchemaMigration.__table__.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        applied = set(conn.execute(select(SchemaMigration.__table__.c.version)).scalars())
+    return [entry for entry in MIGRATIONS if entry[0] not in applied]
+
+def migrate():
+    """Apply every migration newer than the database's schema version"""
+    for version, description, migration in pending_migrations():
+        print(f"Applying migration {version}: {description}")
+        with engine.begin() as conn:
+            migration(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(
+                version=version, description=description
+            ))
+
+    print(f"Schema is at version {MIGRATIONS[-1][0]}")
+
+# Queries on the ingest and aggregation hot paths, with sample parameters
+HOT_QUERIES = [
+    ("pokemon by name", "SELECT pokemon_id FROM pokemon WHERE name = :name", {'name': 'skarmory'}),
+    ("move by name", "SELECT move_id FROM moves WHERE name = :name", {'name': 'roost'}),
+    ("item by name", "SELECT item_id FROM items WHERE item_name = :name", {'name': 'leftovers'}),
+    ("team_pokemon by team", "SELECT hp, speed FROM team_pokemon WHERE team_id = :team_id", {'team_id': 1}),
+    ("teams to aggregate", "SELECT team_id FROM teams WHERE recovery_moves IS NULL AND team_id > :last_team_id "
+                           "ORDER BY team_id LIMIT 1000", {'last_team_id': 0}),
+]
+
+def explain_hot_queries():
+    """Print the query plan of each hot query and whether it uses an index"""
+    all_indexed = True
+    with engine.connect() as conn:
+        for label, sql, params in HOT_QUERIES:
+            if conn.dialect.name == 'sqlite':
+                plan = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params)]
+                indexed = all('USING' in step and 'INDEX' in step for step in plan)
+            else:
+                plan = [dict(row) for row in conn.execute(text(f"EXPLAIN {sql}"), params).mappings()]
+                indexed = all(step.get('key') for step in plan)
+            all_indexed = all_indexed and indexed
+            print(f"{'OK  ' if indexed else 'SCAN'} {label}: {plan}")
+    return all_indexed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bring an existing database up to the current schema")
+    parser.add_argument('--explain', action='store_true',
+                        help="check that the hot lookup queries use indexes")
+    args = parser.parse_args()
+
+    migrate()
+    if args.explain and not explain_hot_queries():
+        sys.exit(1)
@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from databases.http_cache import ResponseCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+PUBLIC_BASE_URL = "https://pokeapi.co/api/v2"
+
+# Point POKEAPI_BASE_URL at a local server to test the populate scripts
+POKEAPI_BASE_URL = os.getenv('POKEAPI_BASE_URL', PUBLIC_BASE_URL).rstrip('/')
+DEFAULT_WORKERS = int(os.getenv('POKEAPI_WORKERS', '16'))
+DEFAULT_RATE_LIMIT = float(os.getenv('POKEAPI_RATE_LIMIT', '40'))  # requests per second
+REQUEST_TIMEOUT = 30
+
+# Responses are cached on disk; within the TTL they are used without any
+# request, after it they are revalidated with If-None-Match/If-Modified-Since.
+# With POKEAPI_OFFLINE=1 only the cache is used, however old it is.
+POKEAPI_CACHE_DIR = os.getenv('POKEAPI_CACHE_DIR', '.cache/pokeapi')
+POKEAPI_CACHE_TTL = float(os.getenv('POKEAPI_CACHE_TTL', str(7 * 24 * 3600)))
+POKEAPI_OFFLINE = os.getenv('POKEAPI_OFFLINE', '') not in ('', '0')
+
+class OfflineCacheMiss(requests.RequestException):
+    """Raised in offline mode for a URL that is not in the response cache"""
+
+def api_url(path):
+    """Full URL for an API path such as 'pokemon?limit=100000'"""
+    return f"{POKEAPI_BASE_URL}/{path.lstrip('/')}"
+
+def resolve_url(url):
+    """Rebase absolute PokeAPI URLs (as found in list results) onto POKEAPI_BASE_URL"""
+    if url.startswith(PUBLIC_BASE_URL):
+        return POKEAPI_BASE_URL + url[len(PUBLIC_BASE_URL):]
+    return url
+
+class RateLimiter:
+    """Spaces calls out so that at most ``rate`` start per second, across threads"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+_rate_limiter = RateLimiter(DEFAULT_RATE_LIMIT)
+response_cache = ResponseCache(POKEAPI_CACHE_DIR, POKEAPI_CACHE_TTL)
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Shared keep-alive session with retries and a pool sized for the workers"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=5,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=['GET']
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=DEFAULT_WORKERS,
+                                  max_retries=retry)
+            _session = requests.Session()
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+def fetch_json(url):
+    """GET a URL and return its JSON, or None for a non-200 response
+
+    Goes through the on-disk response cache; see POKEAPI_CACHE_DIR.
+    """
+    url = resolve_url(url)
+    entry = response_cache.get(url)
+
+    if entry:
+        fresh = response_cache.is_fresh(entry)
+        if fresh or POKEAPI_OFFLINE:
+            response_cache.count('hits' if fresh else 'stale')
+            return json.loads(entry['body'])
+    if POKEAPI_OFFLINE:
+        response_cache.count('misses')
+        raise OfflineCacheMiss(f"{url} is not cached (POKEAPI_OFFLINE is set)")
+
+    headers = response_cache.validators(entry) if entry else {}
+    _rate_limiter.wait()
+    response = get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+
+    if entry and response.status_code == 304:
+        response_cache.touch(entry)
+        response_cache.count('revalidated')
+        return json.loads(entry['body'])
+    if response.status_code == 200:
+        response_cache.put(url, response.text, response.headers.get('ETag'),
+                           response.headers.get('Last-Modified'))
+        response_cache.count('misses')
+        return response.json()
+    return None
+
+def _fetch_or_none(url):
+    try:
+        return fetch_json(url)
+    except requests.RequestException as e:
+        print(f"Error fetching {url}: {e}")
+        return None
+
+def cache_summary():
+    """One-line summary of response cache hits and misses for this run"""
+    return response_cache.summary()
+
+def fetch_all(urls, workers=DEFAULT_WORKERS):
+    """Fetch many URLs concurrently, yielding their JSON (or None) in input order"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_fetch_or_none, urls)
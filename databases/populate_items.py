@@ -1,9 +1,12 @@
 import requests
-from database import Session, Item
+from databases.database import Session, Item
+from databases.upsert import upsert_rows
+from databases.reference_cache import invalidate_reference_cache
+from databases.pokeapi import api_url, cache_summary, fetch_json
 
 def fetch_items():
     # PokeAPI endpoint for items
-    url = "https://pokeapi.co/api/v2/item?limit=2000"  # Large limit to get all items
+    url = api_url("item?limit=2000")  # Large limit to get all items
     
     # Defensive items list
     defensive_items = [
@@ -15,37 +18,38 @@ def fetch_items():
         "eviolite"
     ]
     
+    # Create a database session
+    session = Session()
+
     try:
         # Get the list of all items
-        response = requests.get(url)
-        response.raise_for_status()
-        items_data = response.json()
-        
-        # Create a database session
-        session = Session()
+        items_data = fetch_json(url)
+        if items_data is None:
+            raise requests.RequestException(f"Unexpected response from {url}")
         
         # Process each item
+        rows = []
         for item in items_data['results']:
             item_name = item['name']
-            
-            # Create new item entry
-            new_item = Item(
-                item_name=item_name,
-                is_defensive=(item_name in defensive_items)
-            )
-            
-            session.add(new_item)
+            rows.append({
+                'item_name': item_name,
+                'is_defensive': item_name in defensive_items
+            })
         
-        # Commit all changes
-        session.commit()
-        print("Successfully populated items table!")
+        # Insert new items and update changed ones, so reruns add no duplicates
+        counts = upsert_rows(session, Item, rows, key='item_name')
+        invalidate_reference_cache()
+        print(f"Successfully populated items table! {counts['inserted']} inserted, "
+              f"{counts['updated']} updated, {counts['unchanged']} unchanged")
         
     except requests.RequestException as e:
         print(f"Error fetching data from PokeAPI: {e}")
     except Exception as e:
         print(f"Error: {e}")
+        session.rollback()
     finally:
         session.close()
+    print(cache_summary())
 
 if __name__ == "__main__":
     fetch_items()
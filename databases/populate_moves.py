@@ -1,23 +1,21 @@
-import requests
-from database import Session, Move, engine
+from databases.database import Session, Move, engine
+from databases.upsert import upsert_rows
+from databases.reference_cache import invalidate_reference_cache
+from databases.pokeapi import api_url, cache_summary, fetch_json, fetch_all
 from sqlalchemy.exc import SQLAlchemyError
 
 def get_all_move_urls():
     """Get list of all move URLs"""
-    url = "https://pokeapi.co/api/v2/move?limit=2000"  # Large limit to get all moves
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
+    url = api_url("move?limit=2000")  # Large limit to get all moves
+    data = fetch_json(url)
+    if data:
         # Filter moves after ID 826
         return [(item['name'], item['url']) for item in data['results'] if int(item['url'].split('/')[-2]) > 826]
     return []
 
 def get_move_data(url):
     """Fetch move data from PokeAPI using full URL"""
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json()
-    return None
+    return fetch_json(url)
 
 def populate_moves_table():
     session = Session()
@@ -30,19 +28,18 @@ def populate_moves_table():
     total_moves = len(move_list)
     print(f"Found {total_moves} moves in total")
     
-    for name, url in move_list:
+    # Fetch all moves concurrently and build their rows
+    rows = []
+    move_data_list = fetch_all([url for _, url in move_list])
+    for (name, url), move_data in zip(move_list, move_data_list):
         try:
-            print(f"Fetching move {name}...")
-            move_data = get_move_data(url)
+            print(f"Fetched move {name}")
             
             if move_data:
                 # Get healing value safely, default to 0 if meta doesn't exist
                 healing = move_data.get('meta', {}).get('healing', 0) if move_data.get('meta') else 0
                 
-                # Create or update move
-                existing_move = session.query(Move).filter_by(name=name).first()
-                
-                move_dict = {
+                rows.append({
                     'name': name,
                     'type': move_data['type']['name'],
                     'category': move_data['damage_class']['name'],
@@ -51,27 +48,23 @@ def populate_moves_table():
                     'pp': move_data['pp'],
                     'is_recovery': healing > 0,
                     'is_hazard': name.replace(' ', '-').lower() in hazard_moves
-                }
-                
-                if existing_move:
-                    print(f"Updating {name}...")
-                    for key, value in move_dict.items():
-                        setattr(existing_move, key, value)
-                else:
-                    print(f"Adding {name}...")
-                    new_move = Move(**move_dict)
-                    session.add(new_move)
+                })
                 
-                session.commit()
-                
-        except SQLAlchemyError as e:
-            print(f"Database error for move {name}: {str(e)}")
-            session.rollback()
         except Exception as e:
             print(f"Error processing move {name}: {str(e)}")
-            session.rollback()
+    
+    # Insert new moves and update changed ones in batches
+    try:
+        counts = upsert_rows(session, Move, rows, key='name')
+        print(f"Moves table: {counts['inserted']} inserted, {counts['updated']} updated, "
+              f"{counts['unchanged']} unchanged")
+    except SQLAlchemyError as e:
+        print(f"Database error while saving moves: {str(e)}")
+        session.rollback()
             
     session.close()
+    invalidate_reference_cache()
+    print(cache_summary())
 
 if __name__ == "__main__":
     populate_moves_table()
\ No newline at end of file
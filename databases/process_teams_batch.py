@@ -1,55 +1,113 @@
-from process_team import process_team
-import re
+from databases.database import engine
+from databases.process_team import process_team
+from databases.instrumentation import metrics, DEFAULT_METRICS_PATH
+from databases.reference_cache import refresh_reference_cache
+from databases.bulk_ingest import process_teams_bulk, load_team_hashes, DEFAULT_BATCH_SIZE
+from databases.ingest_pipeline import process_teams_pipeline
+from databases.team_files import (
+    TEAM_HEADER, iter_teams, open_team_file, read_teams, split_teams,
+    IngestState, IngestStateMismatch, DEFAULT_STATE_PATH
+)
+import argparse
+import sys
 from tqdm import tqdm
 
-def split_teams(content):
-    """Split content into individual teams based on === headers"""
-    # Split on the === headers
-    teams = re.split(r'===\s*\[([^\]]+)\]\s*([^=]+?)\s*===', content)
-    
-    # Remove the first empty element and process in groups of 3
-    teams = teams[1:]
-    processed_teams = []
-    
-    for i in range(0, len(teams), 3):
-        if i + 2 >= len(teams):
-            break
-            
-        format_name = teams[i]      # gen4ou
-        team_info = teams[i + 1]    # Azelf~Hyper Offense
-        team_content = teams[i + 2].strip()  # The actual team content
-        # Split team name and playstyle
-        name_parts = team_info.strip().split('~')
-        team_name = name_parts[0]
-        playstyle = name_parts[1] if len(name_parts) > 1 else "Unknown"
-        
-        # Construct the team text in the format expected by process_team
-        team_text = f"Playstyle: {playstyle}\n{team_content}"
-        processed_teams.append({
-            'format': format_name,
-            'team_name': team_name,
-            'team_text': team_text
-        })
-    
-    return processed_teams
+def process_teams_from_file(filepath, bulk=False, batch_size=DEFAULT_BATCH_SIZE,
+                            workers=None, aggregate=False, state=None):
+    """Process multiple teams from a file
 
-def process_teams_from_file(filepath):
-    """Process multiple teams from a file"""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
+    Teams are streamed from the file (plain, .gz or .xz) as they are read,
+    so memory use does not grow with the file size. With ``bulk=True``
+    teams are inserted in batches of ``batch_size``, one transaction per
+    batch, instead of one transaction per team. With ``workers`` set,
+    parsing and stat computation run in that many processes and batches
+    are written by a single writer stage. With ``aggregate=True`` team
+    aggregates are filled in at ingest instead of by aggregate_stats.
 
+    With an IngestState as ``state``, only teams after the part of the file
+    already ingested are processed, and the state is saved once they all
+    have been. Raises IngestStateMismatch if the file no longer starts with
+    that part.
+    """
+    with open_team_file(filepath) as f:
+        lines = f
+        if state is not None:
+            if not state.resume(f):
+                raise IngestStateMismatch(f"{filepath} has changed since {state.path} was written; "
+                                 f"its teams must be re-ingested from scratch")
+            print(f"Skipping the {state.teams} teams already ingested")
+            lines = state.track(f)
+        teams = metrics.counted('ingest', iter_teams(lines))
+        if state is not None:
+            teams = state.count(teams)
+
+        with metrics.stage('ingest'):
+            result = _process_teams(teams, bulk, batch_size, workers, aggregate)
+
+    if state is not None:
+        state.save()
+    return result
+
+def _process_teams(teams, bulk, batch_size, workers, aggregate):
+    if workers:
+        print(f"\nPipeline processing teams with {workers} workers...")
+        return process_teams_pipeline(teams, workers=workers, batch_size=batch_size,
+                                      aggregate=aggregate)
+
+    if bulk:
+        print(f"\nBulk processing teams in batches of {batch_size}...")
+        return process_teams_bulk(teams, batch_size, aggregate=aggregate)
     
-    teams = split_teams(content)
-    
-    print(f"\nProcessing {len(teams)} teams...")
+    # Load pokemon/moves/items once for the whole batch
+    reference = refresh_reference_cache()
+    print(f"Loaded reference data: {reference}")
+
+    # Hashes of the teams already loaded, so re-runs and overlapping
+    # exports don't insert the same team twice
+    known_hashes = load_team_hashes()
+    print(f"Loaded {len(known_hashes)} team hashes")
+
+    print("\nProcessing teams...")
+    duplicates = 0
     for team in tqdm(teams):
         try:
             print(f"\nProcessing: [{team['format']}] {team['team_name']}")
-            process_team(team['team_text'])
+            if process_team(team['team_text'], reference, aggregate=aggregate,
+                            known_hashes=known_hashes) is False:
+                duplicates += 1
         except Exception as e:
             print(f"Failed to process team: {team['team_name']}")
             print(f"Error: {str(e)}\n")
+    print(f"\nSkipped {duplicates} duplicate teams")
 
 if __name__ == "__main__":
-    # Example usage:
-    process_teams_from_file("databases/teams.txt") 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Load a team export into the database")
+    parser.add_argument('filepath', nargs='?', default="databases/teams.txt")
+    parser.add_argument('--bulk', action='store_true',
+                        help="insert teams in batched transactions")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--workers', type=int,
+                        help="parse teams in this many processes (implies batched inserts)")
+    parser.add_argument('--aggregate', action='store_true',
+                        help="fill in team aggregates at ingest time")
+    parser.add_argument('--state', nargs='?', const=DEFAULT_STATE_PATH, metavar='PATH',
+                        help="only ingest teams appended since the run that wrote PATH, then update it")
+    parser.add_argument('--metrics', nargs='?', const=DEFAULT_METRICS_PATH, metavar='PATH',
+                        help="write stage timings and database round trips to PATH (JSON) and .prom")
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable(args.metrics, engine)
+    else:
+        metrics.enable_from_env(engine)
+
+    try:
+        process_teams_from_file(args.filepath, bulk=args.bulk, batch_size=args.batch_size,
+                                workers=args.workers, aggregate=args.aggregate,
+                                state=IngestState(args.state) if args.state else None)
+    except IngestStateMismatch as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        metrics.summary()
+        metrics.write() 
\ No newline at end of file
@@ -0,0 +1,154 @@
+from collections import namedtuple
+import argparse
+import json
+import os
+
+# Compact, immutable records so cached reference data never holds live ORM
+# objects (or the session they belong to).
+PokemonRecord = namedtuple('PokemonRecord', [
+    'pokemon_id', 'base_hp', 'base_attack', 'base_defense',
+    'base_sp_attack', 'base_sp_defense', 'base_speed'
+])
+MoveRecord = namedtuple('MoveRecord', ['move_id', 'is_recovery'])
+ItemRecord = namedtuple('ItemRecord', ['item_id', 'is_defensive'])
+
+
+class ReferenceCache:
+    """Name-keyed, in-memory copy of the pokemon, moves and items tables"""
+
+    def __init__(self):
+        self.pokemon = {}
+        self.moves = {}
+        self.items = {}
+        self.loaded = False
+
+    def load(self, session=None):
+        """Load all three reference tables, one query per table"""
+        # Imported here so a loaded cache can be pickled into worker
+        # processes without them connecting to the database
+        from databases.database import Session, Pokemon, Move, Item
+
+        own_session = session is None
+        if own_session:
+            session = Session()
+        try:
+            pokemon = {}
+            for row in session.query(
+                Pokemon.name, Pokemon.pokemon_id, Pokemon.base_hp,
+                Pokemon.base_attack, Pokemon.base_defense,
+                Pokemon.base_sp_attack, Pokemon.base_sp_defense,
+                Pokemon.base_speed
+            ).order_by(Pokemon.pokemon_id):
+                # Keep the first row per name, like filter_by(...).first()
+                pokemon.setdefault(row[0], PokemonRecord(*row[1:]))
+
+            moves = {}
+            for name, move_id, is_recovery in session.query(
+                Move.name, Move.move_id, Move.is_recovery
+            ).order_by(Move.move_id):
+                moves.setdefault(name, MoveRecord(move_id, bool(is_recovery)))
+
+            items = {}
+            for name, item_id, is_defensive in session.query(
+                Item.item_name, Item.item_id, Item.is_defensive
+            ).order_by(Item.item_id):
+                items.setdefault(name, ItemRecord(item_id, bool(is_defensive)))
+        finally:
+            if own_session:
+                session.close()
+
+        self.pokemon, self.moves, self.items = pokemon, moves, items
+        self.loaded = True
+        return self
+
+    def save(self, path):
+        """Write the cached tables to a JSON snapshot usable without a database"""
+        self._ensure_loaded()
+        snapshot = {
+            'pokemon': {name: list(record) for name, record in self.pokemon.items()},
+            'moves': {name: list(record) for name, record in self.moves.items()},
+            'items': {name: list(record) for name, record in self.items.items()}
+        }
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+
+    @classmethod
+    def from_snapshot(cls, path):
+        """Build a cache from a snapshot written by save()"""
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        cache = cls()
+        cache.pokemon = {name: PokemonRecord(*values) for name, values in snapshot['pokemon'].items()}
+        cache.moves = {name: MoveRecord(*values) for name, values in snapshot['moves'].items()}
+        cache.items = {name: ItemRecord(*values) for name, values in snapshot['items'].items()}
+        cache.loaded = True
+        return cache
+
+    def invalidate(self):
+        """Drop the cached tables; the next lookup reloads them"""
+        self.pokemon, self.moves, self.items = {}, {}, {}
+        self.loaded = False
+
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def get_pokemon(self, name):
+        self._ensure_loaded()
+        return self.pokemon.get(name)
+
+    def get_move(self, name):
+        self._ensure_loaded()
+        return self.moves.get(name)
+
+    def get_item(self, name):
+        self._ensure_loaded()
+        return self.items.get(name)
+
+    def __repr__(self):
+        return (f"<ReferenceCache pokemon={len(self.pokemon)} "
+                f"moves={len(self.moves)} items={len(self.items)}>")
+
+
+# Snapshot of the reference tables shipped next to the model for inference
+DEFAULT_SNAPSHOT_PATH = 'models/reference_data.json'
+
+# Process-wide cache shared by every team processed in a batch run
+_reference_cache = ReferenceCache()
+
+def get_reference_cache():
+    """Return the shared reference cache, loading it on first use"""
+    _reference_cache._ensure_loaded()
+    return _reference_cache
+
+def refresh_reference_cache(session=None):
+    """Reload the shared cache from the database"""
+    return _reference_cache.load(session)
+
+def invalidate_reference_cache():
+    """Mark the shared cache stale, e.g. after a populate_* script has run"""
+    _reference_cache.invalidate()
+
+def reference_state():
+    """Row count and highest id of each reference table, to tell when they change"""
+    from databases.database import Session, Pokemon, Move, Item
+    from sqlalchemy import func
+
+    session = Session()
+    try:
+        return {
+            table: dict(zip(['rows', 'max_id'], session.query(func.count(), func.max(pk)).one()))
+            for table, pk in [('pokemon', Pokemon.pokemon_id), ('moves', Move.move_id), ('items', Item.item_id)]
+        }
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the reference tables for database-free inference")
+    parser.add_argument('path', nargs='?', default=DEFAULT_SNAPSHOT_PATH)
+    args = parser.parse_args()
+
+    reference = refresh_reference_cache()
+    reference.save(args.path)
+    print(f"Wrote {reference} to {args.path}")
@@ -0,0 +1,153 @@
+# Reading team export files, and remembering how much of one has been
+# ingested. Nothing here touches the database.
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import re
+
+# Header line of each team: === [format] name~playstyle ===
+TEAM_HEADER = re.compile(r'===\s*\[([^\]]+)\]\s*([^=]+?)\s*===')
+
+DEFAULT_STATE_PATH = 'models/ingest_state.json'
+HASH_CHUNK_SIZE = 1 << 20
+
+def _team_record(format_name, team_info, content_parts):
+    """Build the record for one team from its header fields and body text"""
+    team_content = ''.join(content_parts).strip()  # The actual team content
+    # Split team name and playstyle
+    name_parts = team_info.strip().split('~')
+    team_name = name_parts[0]
+    playstyle = name_parts[1] if len(name_parts) > 1 else "Unknown"
+
+    # Construct the team text in the format expected by process_team
+    team_text = f"Playstyle: {playstyle}\n{team_content}"
+    return {
+        'format': format_name,
+        'team_name': team_name,
+        'team_text': team_text
+    }
+
+def iter_teams(lines):
+    """Yield team records from an iterable of lines, one team at a time
+
+    Only the lines of the team currently being read are held in memory, so
+    a file object of any size can be passed in directly.
+    """
+    header = None
+    content = []
+    for line in lines:
+        pos = 0
+        for match in TEAM_HEADER.finditer(line):
+            if header:
+                content.append(line[pos:match.start()])
+                yield _team_record(*header, content)
+            header = match.groups()
+            content = []
+            pos = match.end()
+        if header:
+            content.append(line[pos:])
+
+    if header:
+        yield _team_record(*header, content)
+
+def open_team_file(filepath):
+    """Open a team export for reading text, decompressing .gz and .xz files"""
+    if filepath.endswith('.gz'):
+        return gzip.open(filepath, 'rt', encoding='utf-8')
+    if filepath.endswith('.xz'):
+        return lzma.open(filepath, 'rt', encoding='utf-8')
+    return open(filepath, 'r', encoding='utf-8')
+
+def read_teams(filepath):
+    """Stream team records from a (possibly compressed) export file"""
+    with open_team_file(filepath) as f:
+        yield from iter_teams(f)
+
+def split_teams(content):
+    """Split content into individual teams based on === headers"""
+    return list(iter_teams(content.splitlines(keepends=True)))
+
+class IngestStateMismatch(ValueError):
+    """The team export no longer starts with the part already ingested"""
+
+class IngestState:
+    """How much of a team export has already been ingested
+
+    Stores the number of characters and teams read and a SHA-256 of that
+    prefix. As long as the export still starts with exactly that prefix
+    (teams were only appended), ingestion can resume after it. Teams must be
+    appended whole: text added to the last team of the previous run is not
+    picked up.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = {}
+        self.chars = state.get('chars', 0)
+        self.teams = state.get('teams', 0)
+        self.sha256 = state.get('sha256', hashlib.sha256().hexdigest())
+        self._hash = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def reset(self):
+        """Forget everything, so the next run ingests the whole export"""
+        if self.exists():
+            os.remove(self.path)
+        self._load()
+
+    def resume(self, f):
+        """Skip the already-ingested prefix of the open text file ``f``
+
+        Returns False, with ``f`` left part-way through, if the file no
+        longer starts with that prefix.
+        """
+        digest = hashlib.sha256()
+        remaining = self.chars
+        while remaining:
+            chunk = f.read(min(remaining, HASH_CHUNK_SIZE))
+            if not chunk:
+                return False
+            digest.update(chunk.encode('utf-8'))
+            remaining -= len(chunk)
+        if digest.hexdigest() != self.sha256:
+            return False
+        self._hash = digest
+        return True
+
+    def matches(self, filepath):
+        """Whether ``filepath`` still starts with the ingested prefix"""
+        with open_team_file(filepath) as f:
+            return self.resume(f)
+
+    def track(self, lines):
+        """Pass lines through (after resume()), extending the ingested prefix"""
+        for line in lines:
+            self._hash.update(line.encode('utf-8'))
+            self.chars += len(line)
+            yield line
+
+    def count(self, teams):
+        """Pass team records through, counting them"""
+        for team in teams:
+            self.teams += 1
+            yield team
+
+    def save(self):
+        """Record everything passed through track() as ingested"""
+        self.sha256 = self._hash.hexdigest()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'chars': self.chars, 'teams': self.teams, 'sha256': self.sha256}, f)
+        os.replace(tmp_path, self.path)
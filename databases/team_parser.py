@@ -0,0 +1,554 @@
+# Team text parsing and stat computation. Nothing here touches the database,
+# so worker processes can import it without opening a connection.
+import hashlib
+import json
+import re
+import threading
+import time
+import numpy as np
+
+def calculate_stat(base, ev, iv=31, level=100, nature_mod=1.0):
+    return int(((2 * base + iv + (ev/4)) * level / 100 + 5) * nature_mod)
+
+def calculate_hp(base, ev, iv=31, level=100):
+    return int((2 * base + iv + (ev/4)) * level / 100 + level + 10)
+
+# Nature modifiers table
+NATURE_MODIFIERS = {
+    'Lonely': {'increased': 'attack', 'decreased': 'defense'},
+    'Brave': {'increased': 'attack', 'decreased': 'speed'},
+    'Adamant': {'increased': 'attack', 'decreased': 'sp_attack'},
+    'Naughty': {'increased': 'attack', 'decreased': 'sp_defense'},
+    'Bold': {'increased': 'defense', 'decreased': 'attack'},
+    'Relaxed': {'increased': 'defense', 'decreased': 'speed'},
+    'Impish': {'increased': 'defense', 'decreased': 'sp_attack'},
+    'Lax': {'increased': 'defense', 'decreased': 'sp_defense'},
+    'Timid': {'increased': 'speed', 'decreased': 'attack'},
+    'Hasty': {'increased': 'speed', 'decreased': 'defense'},
+    'Jolly': {'increased': 'speed', 'decreased': 'sp_attack'},
+    'Naive': {'increased': 'speed', 'decreased': 'sp_defense'},
+    'Modest': {'increased': 'sp_attack', 'decreased': 'attack'},
+    'Mild': {'increased': 'sp_attack', 'decreased': 'defense'},
+    'Quiet': {'increased': 'sp_attack', 'decreased': 'speed'},
+    'Rash': {'increased': 'sp_attack', 'decreased': 'sp_defense'},
+    'Calm': {'increased': 'sp_defense', 'decreased': 'attack'},
+    'Gentle': {'increased': 'sp_defense', 'decreased': 'defense'},
+    'Sassy': {'increased': 'sp_defense', 'decreased': 'speed'},
+    'Careful': {'increased': 'sp_defense', 'decreased': 'sp_attack'}
+}
+
+# Stat order used by the batched stat engine
+STAT_NAMES = ['hp', 'attack', 'defense', 'sp_attack', 'sp_defense', 'speed']
+
+# All 25 natures; the five neutral ones come last. Unknown natures are
+# treated as neutral, like NATURE_MODIFIERS.get() does.
+NATURE_NAMES = list(NATURE_MODIFIERS) + ['Hardy', 'Docile', 'Serious', 'Bashful', 'Quirky']
+NATURE_INDEX = {name: i for i, name in enumerate(NATURE_NAMES)}
+NEUTRAL_NATURE = NATURE_INDEX['Serious']
+
+def _nature_matrix():
+    matrix = np.ones((len(NATURE_NAMES), len(STAT_NAMES) - 1))
+    for i, name in enumerate(NATURE_NAMES):
+        nature = NATURE_MODIFIERS.get(name)
+        if nature:
+            matrix[i, STAT_NAMES.index(nature['increased']) - 1] = 1.1
+            matrix[i, STAT_NAMES.index(nature['decreased']) - 1] = 0.9
+    return matrix
+
+# Nature multipliers, one row per NATURE_NAMES entry and one column per
+# non-HP stat (STAT_NAMES[1:])
+NATURE_MATRIX = _nature_matrix()
+
+def compute_stats_batch(base, evs, ivs, natures, level=100):
+    """Final stats for many Pokemon at once
+
+    ``base``, ``evs`` and ``ivs`` are (n, 6) integer arrays in STAT_NAMES
+    order and ``natures`` holds n indices into NATURE_NAMES. Returns an
+    (n, 6) int64 array equal to calling calculate_hp/calculate_stat on each
+    value: the float64 operations run in the same order and are truncated
+    the same way.
+    """
+    base = np.asarray(base, dtype=np.int64).reshape(-1, len(STAT_NAMES))
+    evs = np.asarray(evs, dtype=np.int64).reshape(-1, len(STAT_NAMES))
+    ivs = np.asarray(ivs, dtype=np.int64).reshape(-1, len(STAT_NAMES))
+    natures = np.asarray(natures, dtype=np.intp)
+
+    raw = (2 * base + ivs + evs / 4) * level / 100
+    stats = np.empty(raw.shape, dtype=np.int64)
+    stats[:, 0] = np.trunc(raw[:, 0] + level + 10)
+    stats[:, 1:] = np.trunc((raw[:, 1:] + 5) * NATURE_MATRIX[natures])
+    return stats
+
+class TeamParseError(ValueError):
+    """Team text that doesn't follow the Showdown export format
+
+    ``line`` is the 1-based line number in the team text, when known.
+    """
+
+    def __init__(self, reason, line=None):
+        self.reason = reason
+        self.line = line
+        super().__init__(f"line {line}: {reason}" if line else reason)
+
+# Spread labels in EV and IV lines
+STAT_LABELS = {
+    'HP': 'hp',
+    'Atk': 'attack',
+    'Def': 'defense',
+    'SpA': 'sp_attack',
+    'SpD': 'sp_defense',
+    'Spe': 'speed'
+}
+DEFAULT_EVS = dict.fromkeys(STAT_NAMES, 0)
+DEFAULT_IVS = dict.fromkeys(STAT_NAMES, 31)
+# Largest value a single stat's EVs or IVs can take
+MAX_EV = 255
+MAX_IV = 31
+
+# Pokemon whose form depends on gender
+GENDERED_POKEMON = {
+    'meowstic': {'M': '-male', 'F': '-female'},
+    'indeedee': {'M': '-male', 'F': '-female'},
+    'basculegion': {'M': '-male', 'F': '-female'},
+    'oinkologne': {'M': '-male', 'F': '-female'}
+}
+
+def _parse_spread(spread, defaults, kind):
+    """``defaults`` updated from a spread like '252 SpA / 4 SpD / 252 Spe'"""
+    values = dict(defaults)
+    for part in spread.split('/'):
+        fields = part.split()
+        if len(fields) != 2:
+            raise TeamParseError(f"expected '<value> <stat>' in {kind}, got {part.strip()!r}")
+        value, stat = fields
+        if stat not in STAT_LABELS:
+            raise TeamParseError(f"unknown stat {stat!r} in {kind}")
+        try:
+            values[STAT_LABELS[stat]] = int(value)
+        except ValueError:
+            raise TeamParseError(f"{kind} value {value!r} is not a number") from None
+    return values
+
+def parse_evs(ev_string):
+    """Parse EV string like '252 SpA / 4 SpD / 252 Spe' into a dict"""
+    if not ev_string:
+        return dict(DEFAULT_EVS)
+    return _parse_spread(ev_string, DEFAULT_EVS, 'EVs')
+
+def parse_ivs(iv_string):
+    """Parse IV string like 'IVs: 0 Atk / 0 Spe' into a dict"""
+    if not iv_string:
+        return dict(DEFAULT_IVS)
+    return _parse_spread(iv_string.replace('IVs:', '').strip(), DEFAULT_IVS, 'IVs')
+
+# A line holding nothing but a species name
+SPECIES_LINE = re.compile(r'[\w-]+')
+GENDER_TAG = re.compile(r'\s*\((M|F)\)')
+NICKNAMED_SPECIES = re.compile(r'\(([\w\s-]+)\)')
+
+def _parse_pokemon_line(line):
+    """``(name, item)`` from a line like 'Nickname (Meowstic) (F) @ Leftovers'"""
+    if '@' in line:
+        parts = line.split('@')
+        name = parts[0].strip()
+        item = parts[1].strip()
+    else:
+        name = line
+        item = None
+
+    # Gender tags select the form of gendered Pokemon; a remaining
+    # parenthesized name is the species behind a nickname
+    gender = GENDER_TAG.search(name)
+    name = GENDER_TAG.sub('', name).lower()
+    nickname = NICKNAMED_SPECIES.search(name)
+    if nickname:
+        name = nickname.group(1).strip().lower()
+    if gender and name in GENDERED_POKEMON:
+        name += GENDERED_POKEMON[name][gender.group(1)]
+    return name, item
+
+def classify_line(line):
+    """``(kind, value)`` for one line of a team after its playstyle line
+
+    Lines are stripped and checked in this order: a Pokemon (anything with
+    '@' or '(', or a bare species name) gives ``('pokemon', (name,
+    item))``, then a line containing 'Nature' gives ``('nature',
+    nature)``, 'EVs:' and 'IVs:' lines give ``('evs', spread)`` and
+    ``('ivs', spread)``, and a line starting with '-' ``('move', line)``.
+    A spread that doesn't parse gives ``('invalid', reason)``. Blank lines
+    and everything else (abilities, Tera types, levels) give None.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if '@' in line or '(' in line or SPECIES_LINE.fullmatch(line):
+        return 'pokemon', _parse_pokemon_line(line)
+    if 'Nature' in line:
+        return 'nature', line.split('Nature')[0].strip()
+    try:
+        if line.startswith('EVs:'):
+            return 'evs', parse_evs(line.replace('EVs:', '').strip())
+        if line.startswith('IVs:'):
+            return 'ivs', parse_ivs(line)
+    except TeamParseError as e:
+        return 'invalid', e.reason
+    if line.startswith('-'):
+        return 'move', line
+    return None
+
+# classify_line() results by raw line, one dictionary per thread so the
+# server's request threads never share one. Exports repeat the same lines
+# (moves, natures, spreads, Pokemon and items) over and over, so nearly every
+# line is a dictionary hit. A thread's cache is replaced by an empty one when
+# a parse starts with _MAX_CACHED_LINES or more lines in it.
+_thread_state = threading.local()
+_MAX_CACHED_LINES = 1 << 16
+
+def _line_cache():
+    cache = getattr(_thread_state, 'lines', None)
+    if cache is None or len(cache) >= _MAX_CACHED_LINES:
+        cache = _thread_state.lines = {}
+    return cache
+
+def _first_line(team_text):
+    """Number of the first non-blank line of ``team_text``"""
+    return team_text.count('\n', 0, len(team_text) - len(team_text.lstrip())) + 1
+
+def parse_team_text(team_text):
+    """Parse the team format text into a structured dictionary
+
+    The first line is 'Playstyle: <playstyle>'; the rest are classified by
+    classify_line() and each Pokemon's set is built from them in one pass.
+    Raises TeamParseError, with the line number in ``team_text``, for text
+    that doesn't follow the format.
+    """
+    text = team_text.strip()
+    first, _, body = text.partition('\n')
+    first_number = _first_line(team_text)
+    fields = first.split(': ', 2)
+    if len(fields) < 2:
+        raise TeamParseError("expected 'Playstyle: <playstyle>'", first_number)
+
+    cache = _line_cache()
+    pokemon_list = []
+    current_pokemon = None
+    add_move = None
+    number = first_number
+    try:
+        for number, line in enumerate(body.split('\n'), first_number + 1):
+            try:
+                entry = cache[line]
+            except KeyError:
+                entry = cache[line] = classify_line(line)
+            if entry is None:
+                continue
+            kind, value = entry
+            if kind == 'move':
+                add_move(value)
+            elif kind == 'pokemon':
+                moves = []
+                add_move = moves.append
+                current_pokemon = {
+                    'name': value[0],
+                    'item': value[1],
+                    'moves': moves,
+                    'evs': {},
+                    'ivs': {},
+                    'nature': 'Serious'
+                }
+                pokemon_list.append(current_pokemon)
+            elif kind == 'nature':
+                current_pokemon['nature'] = value
+            elif kind == 'evs':
+                current_pokemon['evs'] = dict(value)
+            elif kind == 'ivs':
+                current_pokemon['ivs'] = dict(value)
+            else:
+                raise TeamParseError(value, number)
+    except TypeError:
+        # add_move and current_pokemon are None until the first Pokemon line
+        if current_pokemon is not None:
+            raise
+        raise TeamParseError("expected a Pokemon ('<name> @ <item>') before its details", number) from None
+
+    return {
+        'playstyle': fields[1],
+        'pokemon': pokemon_list
+    }
+
+def normalize_pokemon_name(name):
+    """Convert a parsed Pokemon name to its name in the pokemon table"""
+    # Convert Pokemon name to database format (replace space with hyphen)
+    db_pokemon_name = name.lower().replace(' ', '-')
+
+    # Special handling for specific Pokemon forms
+    if db_pokemon_name in ['ogerpon-wellspring', 'ogerpon-hearthflame', 'ogerpon-cornerstone']:
+        db_pokemon_name += '-mask'
+    elif db_pokemon_name == 'keldeo':
+        db_pokemon_name = 'keldeo-ordinary'
+    elif db_pokemon_name in ['landorus', 'thundurus', 'tornadus', 'enamorus']:
+        db_pokemon_name += '-incarnate'
+    elif db_pokemon_name == 'sinistcha-masterpiece':
+        db_pokemon_name = 'sinistcha'
+    elif db_pokemon_name in ['gastrodon-east', 'gastrodon-west']:
+        db_pokemon_name = 'gastrodon'
+    elif db_pokemon_name == 'greninja-bond':
+        db_pokemon_name = 'greninja'
+    elif db_pokemon_name == 'maushold':
+        db_pokemon_name = 'maushold-family-of-three'
+    elif db_pokemon_name == 'mimikyu':
+        db_pokemon_name = 'mimikyu-busted'
+    elif db_pokemon_name == 'tauros-paldea-blaze':
+        db_pokemon_name = 'tauros-paldea-blaze-breed'
+    elif db_pokemon_name == 'tauros-paldea-aqua':
+        db_pokemon_name = 'tauros-paldea-aqua-breed'
+    elif db_pokemon_name == 'tauros-paldea-combat':
+        db_pokemon_name = 'tauros-paldea-combat-breed'
+    elif db_pokemon_name == 'meloetta':
+        db_pokemon_name = 'meloetta-aria'
+    elif db_pokemon_name == 'indeedee':
+        db_pokemon_name = 'indeedee-male'
+    elif db_pokemon_name == 'basculegion':
+        db_pokemon_name = 'basculegion-male'
+
+    return db_pokemon_name
+
+def team_hash(team_data):
+    """SHA-256 of a parsed team's canonical form, used to skip duplicate teams
+
+    Pokemon are compared by normalized name and item, nature (every neutral
+    or unknown nature counts as the same), full EV and IV spreads and set of
+    moves, and teams by playstyle and their Pokemon in sorted order. So
+    reordering Pokemon or moves, or spelling out default EVs and IVs, does
+    not change the hash.
+    """
+    pokemon = []
+    for poke_data in team_data['pokemon']:
+        nature = poke_data['nature'] if poke_data['nature'] in NATURE_MODIFIERS else 'Neutral'
+        pokemon.append([
+            normalize_pokemon_name(poke_data['name']),
+            (poke_data['item'] or '').lower().replace(' ', '-'),
+            nature,
+            [poke_data['evs'].get(stat, 0) for stat in STAT_NAMES],
+            [poke_data['ivs'].get(stat, 31) for stat in STAT_NAMES],
+            sorted({move.lstrip('- ').lower().replace(' ', '-') for move in poke_data['moves']})
+        ])
+    canonical = json.dumps([team_data['playstyle'], sorted(pokemon)], separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def _warn(message, warnings):
+    if warnings is None:
+        print(message)
+    else:
+        warnings.append(message)
+
+def team_aggregates(pokemon_rows, recovery_moves, defensive_items):
+    """Team aggregate columns, matching what aggregate_stats computes in SQL"""
+    if not pokemon_rows:
+        # SUM over no rows is NULL
+        hp = offense = defense = spdef = speed = None
+    else:
+        hp = sum(row['hp'] for row in pokemon_rows)
+        offense = sum(max(row['attack'], row['sp_attack']) for row in pokemon_rows)
+        defense = sum(row['defense'] for row in pokemon_rows)
+        spdef = sum(row['sp_defense'] for row in pokemon_rows)
+        speed = sum(row['speed'] for row in pokemon_rows)
+    return {
+        'team_hp': hp,
+        'team_offense': offense,
+        'team_defense': defense,
+        'team_spdef': spdef,
+        'team_speed': speed,
+        'recovery_moves': recovery_moves,
+        'defensive_items': defensive_items
+    }
+
+def _check_spread(pokemon_name, kind, values, maximum):
+    for stat, value in zip(STAT_NAMES, values):
+        if not isinstance(value, int) or not 0 <= value <= maximum:
+            raise ValueError(f"{pokemon_name}: {kind} for {stat} must be 0-{maximum}, got {value!r}")
+
+def _resolve_team(team_data, reference, warnings):
+    """Look up a parsed team's Pokemon, items and moves
+
+    Returns ``(team_row, pokemon_rows, stat_inputs, recovery_moves,
+    defensive_items)``. The stat columns of the pokemon rows are left empty;
+    ``stat_inputs`` holds one ``(base, evs, ivs, nature)`` entry per row for
+    compute_stats_batch. Raises ValueError for EVs or IVs out of range.
+    """
+    team_row = {
+        'team_name': f"Team {team_data['playstyle']}",
+        'playstyle': team_data['playstyle'],
+        'team_hash': team_hash(team_data)
+    }
+
+    pokemon_rows = []
+    stat_inputs = []
+    recovery_moves = 0
+    defensive_items = 0
+    for poke_data in team_data['pokemon']:
+        db_pokemon_name = normalize_pokemon_name(poke_data['name'])
+
+        # Get Pokemon base data
+        base_pokemon = reference.get_pokemon(db_pokemon_name)
+        if not base_pokemon:
+            _warn(f"Warning: Pokemon {poke_data['name']} not found in database", warnings)
+            continue
+
+        evs = [poke_data['evs'].get(stat, 0) for stat in STAT_NAMES]
+        ivs = [poke_data['ivs'].get(stat, 31) for stat in STAT_NAMES]
+        # Checked here so a bad spread fails this team, not the whole
+        # compute_stats_batch call it would be part of
+        _check_spread(poke_data['name'], 'EVs', evs, MAX_EV)
+        _check_spread(poke_data['name'], 'IVs', ivs, MAX_IV)
+        stat_inputs.append((
+            [int(getattr(base_pokemon, f'base_{stat}')) for stat in STAT_NAMES],
+            evs,
+            ivs,
+            NATURE_INDEX.get(poke_data['nature'], NEUTRAL_NATURE)
+        ))
+
+        # Get item if present
+        item = None
+        if poke_data.get('item'):  # Use the stored item from parse_team_text
+            item_name = poke_data['item'].lower().replace(' ', '-')
+            item = reference.get_item(item_name)
+            # Silently handle missing items by using None/null
+            # No warning message needed
+        if item and item.is_defensive:
+            defensive_items += 1
+
+        # Every row carries the same keys so rows can be bulk inserted
+        row = {
+            'pokemon_id': base_pokemon.pokemon_id,
+            'item_id': item.item_id if item else None,  # Will be None if item not found
+            'move1_id': None,
+            'move2_id': None,
+            'move3_id': None,
+            'move4_id': None,
+            'hp': None,
+            'attack': None,
+            'defense': None,
+            'sp_attack': None,
+            'sp_defense': None,
+            'speed': None
+        }
+
+        # Add moves
+        recovery_ids = set()
+        for i, move_name in enumerate(poke_data['moves'], 1):
+            # Remove leading dash and spaces
+            db_move_name = move_name.lstrip('- ').lower()
+
+            # Convert to database format (replace spaces with hyphens)
+            db_move_name = db_move_name.replace(' ', '-')
+
+            move = reference.get_move(db_move_name)
+            if move:
+                # team_pokemon only has four move slots
+                if i <= 4:
+                    row[f'move{i}_id'] = move.move_id
+                    if move.is_recovery:
+                        recovery_ids.add(move.move_id)
+            else:
+                _warn(f"Warning: Move {move_name} not found in database", warnings)
+
+        # Each distinct recovery move counts once per Pokemon, like the join
+        recovery_moves += len(recovery_ids)
+        pokemon_rows.append(row)
+
+    return team_row, pokemon_rows, stat_inputs, recovery_moves, defensive_items
+
+def _compute_stats(stat_inputs):
+    """Run compute_stats_batch over a list of _resolve_team stat inputs"""
+    if not stat_inputs:
+        return np.empty((0, len(STAT_NAMES)), dtype=np.int64)
+    base, evs, ivs, natures = zip(*stat_inputs)
+    return compute_stats_batch(base, evs, ivs, natures)
+
+def _apply_stats(pokemon_rows, stats):
+    # tolist() hands the database driver plain ints rather than numpy scalars
+    for row, values in zip(pokemon_rows, stats.tolist()):
+        row.update(zip(STAT_NAMES, values))
+
+def build_team_rows(team_data, reference, warnings=None, aggregate=False):
+    """Build the teams row and team_pokemon rows for a parsed team
+
+    Returns ``(team_row, pokemon_rows)`` as plain dicts. The pokemon rows
+    have no ``team_id`` yet; the caller sets it once the team is inserted.
+    Warnings are printed, or collected into ``warnings`` if a list is given.
+    With ``aggregate=True`` the team row also gets its aggregate columns, so
+    aggregate_stats has nothing left to do for it.
+    """
+    team_row, pokemon_rows, stat_inputs, recovery_moves, defensive_items = \
+        _resolve_team(team_data, reference, warnings)
+    _apply_stats(pokemon_rows, _compute_stats(stat_inputs))
+
+    if aggregate:
+        team_row.update(team_aggregates(pokemon_rows, recovery_moves, defensive_items))
+
+    return team_row, pokemon_rows
+
+# Classifier input features, in training order (named after the teams columns)
+FEATURE_COLUMNS = [
+    'team_hp', 'team_offense', 'team_defense', 'team_spdef',
+    'team_speed', 'recovery_moves', 'defensive_items'
+]
+
+def team_features(team_text, reference, warnings=None):
+    """Classifier feature vector for a team, computed without the database
+
+    Accepts plain Showdown export text; the 'Playstyle:' line that
+    process_team expects is optional. Feature values are None if none of
+    the team's Pokemon were recognized.
+    """
+    if not team_text.lstrip().startswith('Playstyle:'):
+        team_text = f"Playstyle: Unknown\n{team_text}"
+    team_data = parse_team_text(team_text)
+    team_row, _ = build_team_rows(team_data, reference, warnings, aggregate=True)
+    return [team_row[column] for column in FEATURE_COLUMNS]
+
+def prepare_teams(teams, reference, quarantine, warnings=None, aggregate=False, timings=None):
+    """Parse split_teams records and build their rows
+
+    Returns a list of ``(team, team_row, pokemon_rows)``; teams that fail
+    to parse are appended to ``quarantine`` instead. Stats for every
+    Pokemon in ``teams`` are computed in a single compute_stats_batch call.
+    If a dict is given as ``timings``, the seconds spent parsing and
+    building rows are added to its 'parse' and 'stats' entries.
+    """
+    start = time.perf_counter()
+    parse_seconds = 0.0
+    resolved = []
+    for team in teams:
+        try:
+            parse_start = time.perf_counter()
+            team_data = parse_team_text(team['team_text'])
+            parse_seconds += time.perf_counter() - parse_start
+            resolved.append((team, _resolve_team(team_data, reference, warnings)))
+        except Exception as e:
+            quarantine.append({
+                'format': team['format'],
+                'team_name': team['team_name'],
+                'error': str(e)
+            })
+
+    stats = _compute_stats([
+        stat_input
+        for _, (_, _, stat_inputs, _, _) in resolved
+        for stat_input in stat_inputs
+    ])
+
+    prepared = []
+    offset = 0
+    for team, (team_row, pokemon_rows, _, recovery_moves, defensive_items) in resolved:
+        _apply_stats(pokemon_rows, stats[offset:offset + len(pokemon_rows)])
+        offset += len(pokemon_rows)
+        if aggregate:
+            team_row.update(team_aggregates(pokemon_rows, recovery_moves, defensive_items))
+        prepared.append((team, team_row, pokemon_rows))
+
+    if timings is not None:
+        timings['parse'] = timings.get('parse', 0.0) + parse_seconds
+        timings['stats'] = timings.get('stats', 0.0) + time.perf_counter() - start - parse_seconds
+    return prepared
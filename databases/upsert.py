@@ -0,0 +1,65 @@
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+DEFAULT_UPSERT_BATCH_SIZE = 500
+
+def _upsert_statement(session, table, key, columns):
+    """INSERT ... ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE for the bound dialect"""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'mysql':
+        stmt = mysql.insert(table)
+        return stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in columns})
+    if dialect in ('sqlite', 'postgresql'):
+        module = sqlite if dialect == 'sqlite' else postgresql
+        stmt = module.insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c[key]],
+            set_={column: stmt.excluded[column] for column in columns}
+        )
+    raise NotImplementedError(f"No native upsert for the {dialect} dialect")
+
+def upsert_rows(session, model, rows, key, batch_size=DEFAULT_UPSERT_BATCH_SIZE):
+    """Insert or update reference rows keyed on a unique column
+
+    Each batch costs one SELECT to find which rows are new or changed and
+    one native upsert for just those rows, and is committed on its own.
+    Relies on a unique index on ``key``. Returns a dict of inserted,
+    updated and unchanged counts.
+    """
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    if not rows:
+        return counts
+
+    table = model.__table__
+    columns = [column for column in rows[0] if column != key]
+    stmt = _upsert_statement(session, table, key, columns)
+
+    # Last row wins if the same key appears twice
+    rows = list({row[key]: row for row in rows}.values())
+
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        existing = {
+            row[key]: row for row in session.execute(
+                select(table.c[key], *[table.c[column] for column in columns])
+                .where(table.c[key].in_([row[key] for row in batch]))
+            ).mappings()
+        }
+
+        changed = []
+        for row in batch:
+            current = existing.get(row[key])
+            if current is None:
+                counts['inserted'] += 1
+                changed.append(row)
+            elif any(current[column] != row[column] for column in columns):
+                counts['updated'] += 1
+                changed.append(row)
+            else:
+                counts['unchanged'] += 1
+
+        if changed:
+            session.execute(stmt, changed)
+        session.commit()
+
+    return counts
@@ -0,0 +1,60 @@
+from databases.database import Session, Team
+from databases.aggregate_stats import pending_teams_filter, compute_team_aggregates, DEFAULT_CHUNK_SIZE
+import argparse
+import random
+import sys
+
+AGGREGATE_COLUMNS = [
+    'team_hp', 'team_offense', 'team_defense', 'team_spdef',
+    'team_speed', 'recovery_moves', 'defensive_items'
+]
+
+def verify_team_aggregates(sample=None, seed=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Re-derive stored team aggregates in SQL and report mismatches
+
+    Checks ``sample`` randomly chosen aggregated teams, or all of them when
+    ``sample`` is None. Returns a list of
+    ``(team_id, column, stored, expected)`` tuples.
+    """
+    session = Session()
+    try:
+        team_ids = [team_id for (team_id,) in session.query(Team.team_id).filter(
+            ~pending_teams_filter()
+        ).order_by(Team.team_id)]
+        if sample is not None and sample < len(team_ids):
+            team_ids = sorted(random.Random(seed).sample(team_ids, sample))
+
+        mismatches = []
+        for i in range(0, len(team_ids), chunk_size):
+            chunk = team_ids[i:i + chunk_size]
+            expected = compute_team_aggregates(session, chunk)
+            stored = session.query(
+                Team.team_id, *[getattr(Team, column) for column in AGGREGATE_COLUMNS]
+            ).filter(Team.team_id.in_(chunk))
+
+            for row in stored:
+                for column, value in zip(AGGREGATE_COLUMNS, row[1:]):
+                    expected_value = expected[row[0]][column]
+                    if value != expected_value:
+                        mismatches.append((row[0], column, value, expected_value))
+    finally:
+        session.close()
+
+    print(f"Checked {len(team_ids)} teams, found {len(mismatches)} mismatched values")
+    for team_id, column, value, expected_value in mismatches[:20]:
+        print(f"  team {team_id}: {column} stored={value} expected={expected_value}")
+    if len(mismatches) > 20:
+        print(f"  ... and {len(mismatches) - 20} more")
+
+    return mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check stored team aggregates against the team_pokemon rows")
+    parser.add_argument('--sample', type=int, default=1000,
+                        help="number of random teams to check (default 1000)")
+    parser.add_argument('--all', action='store_true', help="check every aggregated team")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    mismatches = verify_team_aggregates(None if args.all else args.sample, args.seed)
+    sys.exit(1 if mismatches else 0)
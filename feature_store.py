@@ -0,0 +1,187 @@
+from databases.team_parser import FEATURE_COLUMNS
+from databases.instrumentation import metrics
+import argparse
+import json
+import os
+import shutil
+import time
+import numpy as np
+
+DEFAULT_STORE_DIR = 'models/features'
+EXPORT_CHUNK_SIZE = 10000
+
+# Column files: (file name, dtype, values per team)
+COLUMN_FILES = [
+    ('team_ids.bin', np.int64, 1),
+    ('features.bin', np.float64, len(FEATURE_COLUMNS)),
+    ('labels.bin', np.int32, 1)
+]
+
+class FeatureStore:
+    """On-disk, columnar copy of the classifier's training data keyed by team_id
+
+    Each column is a raw, append-only file: team ids, the FEATURE_COLUMNS
+    matrix (NULL aggregates are stored as NaN) and labels as integer codes
+    into ``meta['classes']``. meta.json records how many rows are committed,
+    so bytes left past that count by an interrupted append are ignored and
+    overwritten by the next one.
+    """
+
+    def __init__(self, directory=DEFAULT_STORE_DIR):
+        self.directory = directory
+        self.meta = self._read_meta()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._path('meta.json'), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            # created_at tells a rebuilt store apart from one that was appended to
+            return {'count': 0, 'last_team_id': 0, 'classes': [], 'columns': FEATURE_COLUMNS,
+                    'created_at': time.time()}
+
+    def _write_meta(self):
+        tmp_path = self._path('meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._path('meta.json'))
+
+    def exists(self):
+        return os.path.exists(self._path('meta.json'))
+
+    @property
+    def count(self):
+        return self.meta['count']
+
+    @property
+    def last_team_id(self):
+        return self.meta['last_team_id']
+
+    def reset(self):
+        """Delete everything in the store"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.meta = self._read_meta()
+
+    def append(self, team_ids, features, labels):
+        """Append teams, which must come after ``last_team_id`` in team_id order"""
+        team_ids = np.asarray(team_ids, dtype=np.int64)
+        if not len(team_ids):
+            return
+        if team_ids[0] <= self.last_team_id or np.any(np.diff(team_ids) <= 0):
+            raise ValueError("Teams must be appended in increasing team_id order")
+
+        classes = self.meta['classes']
+        codes = {label: code for code, label in enumerate(classes)}
+        for label in labels:
+            if label not in codes:
+                codes[label] = len(classes)
+                classes.append(label)
+        columns = [
+            team_ids,
+            np.asarray(features, dtype=np.float64).reshape(len(team_ids), len(FEATURE_COLUMNS)),
+            np.array([codes[label] for label in labels], dtype=np.int32)
+        ]
+
+        os.makedirs(self.directory, exist_ok=True)
+        for (name, dtype, width), values in zip(COLUMN_FILES, columns):
+            path = self._path(name)
+            with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+                f.seek(self.count * width * np.dtype(dtype).itemsize)
+                f.truncate()
+                f.write(values.tobytes())
+
+        self.meta['count'] += len(team_ids)
+        self.meta['last_team_id'] = int(team_ids[-1])
+        self._write_meta()
+
+    def load(self):
+        """``(team_ids, features, label_codes)`` as read-only memory maps"""
+        columns = []
+        for name, dtype, width in COLUMN_FILES:
+            shape = (self.count, width) if width > 1 else (self.count,)
+            if self.count:
+                columns.append(np.memmap(self._path(name), dtype=dtype, mode='r', shape=shape))
+            else:
+                columns.append(np.empty(shape, dtype=dtype))
+        return tuple(columns)
+
+    def training_data(self, min_class_size=2):
+        """Feature matrix and playstyle labels, like train_classifier.load_team_data
+
+        Playstyles with fewer than ``min_class_size`` teams are dropped. The
+        matrix is the memory map itself unless rows have to be filtered out.
+        """
+        _, features, codes = self.load()
+        classes = np.array(self.meta['classes'])
+        if not self.count:
+            return features, classes[codes]
+
+        keep = np.bincount(codes, minlength=len(classes))[codes] >= min_class_size
+        if keep.all():
+            return features, classes[codes]
+        return features[keep], classes[codes[keep]]
+
+@metrics.timed('export')
+def sync_feature_store(store=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Append labelled teams added since the last export
+
+    Run after aggregate_stats, since a team's row is exported once. If teams
+    the store already holds have been deleted, it is rebuilt from scratch.
+    Returns the number of teams appended.
+    """
+    from databases.database import Session, Team, engine
+    from sqlalchemy import select, func
+
+    metrics.watch(engine)
+    store = store or FeatureStore()
+    session = Session()
+    try:
+        if store.count:
+            held = session.scalar(select(func.count()).select_from(Team).where(
+                Team.playstyle.isnot(None),
+                Team.team_id <= store.last_team_id
+            ))
+            if held != store.count:
+                print(f"Feature store holds {store.count} teams but the database has {held}; rebuilding it")
+                store.reset()
+
+        stmt = select(
+            Team.team_id, *[getattr(Team, column) for column in FEATURE_COLUMNS], Team.playstyle
+        ).where(
+            Team.playstyle.isnot(None),
+            Team.team_id > store.last_team_id
+        ).order_by(Team.team_id).execution_options(yield_per=chunk_size)
+
+        appended = 0
+        for rows in session.execute(stmt).partitions():
+            store.append(
+                [row[0] for row in rows],
+                np.array([row[1:-1] for row in rows], dtype=np.float64),
+                [row[-1] for row in rows]
+            )
+            appended += len(rows)
+            metrics.count('export', len(rows))
+    finally:
+        session.close()
+
+    print(f"Feature store: appended {appended} teams, {store.count} in total")
+    return appended
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export new teams' features to the feature store")
+    parser.add_argument('--dir', default=DEFAULT_STORE_DIR)
+    parser.add_argument('--reset', action='store_true', help="re-export every team")
+    parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    metrics.enable_from_env()
+    store = FeatureStore(args.dir)
+    if args.reset:
+        store.reset()
+    try:
+        sync_feature_store(store, args.chunk_size)
+    finally:
+        metrics.write()
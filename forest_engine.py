@@ -0,0 +1,124 @@
+# Batched random forest inference straight from the model artifact's packed
+# node arrays, with the scaler applied on the way in. Every (row, tree) pair
+# of a batch descends one level per step, so the Python loop runs once per
+# tree level instead of once per tree.
+import numpy as np
+from model_artifact import ModelArtifact, ARTIFACT_PATH
+
+# (row, tree) pairs walked together; small enough for the working arrays
+# to stay in cache
+PAIRS_PER_CHUNK = 1 << 16
+# Every this many levels, pairs already at a leaf are dropped from the walk
+# if they are at least half of it
+COMPACT_EVERY = 4
+
+class ForestEngine:
+    """Class probabilities of a RandomForestClassifier from its model artifact
+
+    Takes unscaled feature rows and returns what
+    ``clf.predict_proba(scaler.transform(X))`` does, to floating-point
+    tolerance: rows are scaled in float64 and cast to float32 as sklearn's
+    trees do, and NaNs follow each node's missing-value direction.
+    """
+
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.classes_ = artifact.classes
+        self.n_features_in_ = artifact.n_features
+        self.n_trees = artifact.n_trees
+        self.chunk_rows = max(1, PAIRS_PER_CHUNK // self.n_trees)
+
+        # Walking layout, private to this process but a fraction of the
+        # artifact's size. Leaves point back at themselves, so every pair can
+        # take the same number of steps; children are interleaved so a step
+        # is children[2 * node + went_right].
+        is_leaf = artifact.left == -1
+        nodes = np.arange(artifact.n_nodes)
+        self._children = np.stack([
+            np.where(is_leaf, nodes, artifact.left),
+            np.where(is_leaf, nodes, artifact.right)
+        ], axis=1).astype(np.intp).ravel()
+        self._split_feature = np.where(is_leaf, 0, artifact.feature).astype(np.intp)
+        # For float32 x, x <= t exactly when x <= the largest float32 <= t
+        threshold = artifact.threshold.astype(np.float32)
+        rounded_up = threshold.astype(np.float64) > artifact.threshold
+        threshold[rounded_up] = np.nextafter(threshold[rounded_up], np.float32(-np.inf))
+        self._threshold = threshold
+        self._missing_right = artifact.missing_left == 0
+        self._is_leaf = is_leaf
+
+        self.depth = 0
+        frontier = artifact.roots.astype(np.intp)
+        while True:
+            frontier = frontier[~is_leaf[frontier]]
+            if not len(frontier):
+                break
+            frontier = np.concatenate([artifact.left[frontier], artifact.right[frontier]]).astype(np.intp)
+            self.depth += 1
+
+    @classmethod
+    def load(cls, path=ARTIFACT_PATH):
+        return cls(ModelArtifact(path))
+
+    def _leaves(self, scaled):
+        """Leaf node reached by each (row, tree) pair of float32 ``scaled`` rows"""
+        n_rows = len(scaled)
+        flat_X = scaled.ravel()
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.intp) * self.n_features_in_, self.n_trees)
+        node = np.tile(self.artifact.roots.astype(np.intp), n_rows)
+        check_missing = bool(np.isnan(flat_X).any())
+        leaves = node.copy()
+        # Where each pair still walking goes in ``leaves``; None until compacted
+        position = None
+
+        buffers = (np.empty(len(node), dtype=np.intp), np.empty(len(node), dtype=np.float32),
+                   np.empty(len(node), dtype=np.float32), np.empty(len(node), dtype=bool))
+        index, values, threshold, went_right = buffers
+        for step in range(1, self.depth + 1):
+            if step % COMPACT_EVERY == 0:
+                finished = self._is_leaf[node]
+                if np.count_nonzero(finished) * 2 >= len(node):
+                    if position is None:
+                        position = np.arange(len(node))
+                    leaves[position[finished]] = node[finished]
+                    walking = ~finished
+                    node, row_offset, position = node[walking], row_offset[walking], position[walking]
+                    if not len(node):
+                        break
+                    index, values, threshold, went_right = (buffer[:len(node)] for buffer in buffers)
+
+            np.take(self._split_feature, node, out=index, mode='clip')
+            index += row_offset
+            np.take(flat_X, index, out=values, mode='clip')
+            np.take(self._threshold, node, out=threshold, mode='clip')
+            np.greater(values, threshold, out=went_right)
+            if check_missing:
+                missing = np.isnan(values)
+                went_right[missing] = self._missing_right[node[missing]]
+            node *= 2
+            node += went_right
+            np.take(self._children, node, out=node, mode='clip')
+
+        if position is None:
+            return node
+        leaves[position] = node
+        return leaves
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected rows of {self.n_features_in_} features, got shape {X.shape}")
+
+        a = self.artifact
+        probabilities = np.empty((len(X), len(self.classes_)), dtype=np.float64)
+        for start in range(0, len(X), self.chunk_rows):
+            # StandardScaler.transform, then the float32 cast sklearn's trees apply
+            scaled = ((X[start:start + self.chunk_rows] - a.scaler_mean) / a.scaler_scale).astype(np.float32)
+            # At a leaf, feature holds the row of leaf_values
+            leaf_rows = a.feature[self._leaves(scaled)].reshape(len(scaled), self.n_trees)
+            probabilities[start:start + len(scaled)] = a.leaf_values[leaf_rows].sum(axis=1)
+        probabilities /= self.n_trees
+        return probabilities
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
@@ -1,40 +1,60 @@
-import os
-import sys
-import subprocess
+import argparse
+from pipeline_runner import Pipeline, Stage, DEFAULT_JOBS
+from databases.database import engine
+from databases.instrumentation import metrics, DEFAULT_METRICS_PATH
+from databases.populate_pokemon import populate_pokemon_table
+from databases.populate_items import fetch_items
+from databases.populate_moves import populate_moves_table
+from databases.reference_cache import reference_state
+from rebuild_classifier import rebuild_stages
 
-def run_script(script_name):
-    """Run a Python script and check for successful execution."""
-    print(f"Running {script_name}...")
-    try:
-        subprocess.run([sys.executable, script_name], check=True)
-        print(f"Successfully completed {script_name}")
-    except subprocess.CalledProcessError as e:
-        print(f"Error running {script_name}: {e}")
-        sys.exit(1)
-
-def main():
-    # List of scripts to run in order
-    setup_scripts = [
-        "database.py",
-        "populate_pokemon.py",
-        "populate_items.py",
-        "populate_moves.py",
-        "rebuild_classifier.py"
+# (stage, function, table it fills); they don't depend on each other, so
+# they fetch from PokeAPI at the same time
+POPULATE_STAGES = [
+    ('populate_pokemon', populate_pokemon_table, 'pokemon'),
+    ('populate_items', fetch_items, 'items'),
+    ('populate_moves', populate_moves_table, 'moves')
+]
+
+def setup_stages():
+    """The rebuild's stages, after filling the reference tables"""
+    def populated(table):
+        return lambda: reference_state()[table]['rows'] > 0
+
+    populate = [
+        # Once filled, a table is only fetched again with --force
+        Stage(name, run, deps=['migrate'], check=populated(table))
+        for name, run, table in POPULATE_STAGES
     ]
+    return rebuild_stages(after=[stage.name for stage in populate]) + populate
 
+def main(jobs=DEFAULT_JOBS, force=False):
     print("Starting initial setup...")
-    
-    # Check if all scripts exist
-    for script in setup_scripts:
-        if not os.path.exists(script):
-            print(f"Error: {script} not found!")
-            sys.exit(1)
 
-    # Run each script in sequence
-    for script in setup_scripts:
-        run_script(script)
+    pipeline = Pipeline('setup', setup_stages())
+    results = pipeline.run(jobs, force)
+    pipeline.summary(results)
 
     print("\nInitial setup completed successfully!")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Create the database, fill the reference tables and build the classifier")
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS,
+                        help="stages to run at the same time")
+    parser.add_argument('--force', action='store_true',
+                        help="run every stage, even those that are up to date")
+    parser.add_argument('--metrics', nargs='?', const=DEFAULT_METRICS_PATH, metavar='PATH',
+                        help="write every stage's timings and database round trips to PATH (JSON) and .prom")
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    if args.metrics:
+        metrics.enable(args.metrics, engine)
+    else:
+        metrics.enable_from_env(engine)
+    try:
+        main(args.jobs, args.force)
+    finally:
+        metrics.summary()
+        metrics.write()
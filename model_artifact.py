@@ -0,0 +1,162 @@
+# Flat, memory-mappable copy of the trained forest and its scaler. Workers
+# map the file read-only, so they all share one copy in the page cache
+# instead of each unpickling its own.
+import argparse
+import json
+import mmap
+import os
+import struct
+import numpy as np
+
+ARTIFACT_PATH = 'models/random_forest_classifier.forest'
+MAGIC = b'PTCFORST'
+FORMAT_VERSION = 1
+# Magic, format version and header length, followed by the JSON header
+PREAMBLE = struct.Struct('<8sII')
+ALIGNMENT = 64
+
+def _forest_arrays(clf, scaler):
+    """Pack every tree's nodes into shared flat arrays
+
+    Trees are laid out one after another, starting at ``roots``. Child
+    indices are global node indices, -1 at leaves. At a leaf, ``feature``
+    holds the row of ``leaf_values``, its class distribution normalized the
+    way DecisionTreeClassifier.predict_proba does.
+    """
+    n_classes = len(clf.classes_)
+    roots, feature, threshold, left, right, missing_left, leaf_values = [], [], [], [], [], [], []
+    n_nodes = n_leaves = 0
+    for estimator in clf.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == -1
+        leaf_ids = n_leaves + np.cumsum(is_leaf) - 1
+
+        roots.append(n_nodes)
+        feature.append(np.where(is_leaf, leaf_ids, tree.feature))
+        threshold.append(tree.threshold)
+        left.append(np.where(is_leaf, -1, tree.children_left + n_nodes))
+        right.append(np.where(is_leaf, -1, tree.children_right + n_nodes))
+        # Trees fitted on data with NaNs route them per node (scikit-learn 1.3+)
+        missing_left.append(getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count)))
+
+        values = tree.value[is_leaf, 0, :n_classes].astype(np.float64)
+        totals = values.sum(axis=1, keepdims=True)
+        totals[totals == 0.0] = 1.0
+        leaf_values.append(values / totals)
+
+        n_nodes += tree.node_count
+        n_leaves += int(is_leaf.sum())
+
+    n_features = clf.n_features_in_
+    mean = getattr(scaler, 'mean_', None)
+    scale = getattr(scaler, 'scale_', None)
+    return {
+        'roots': np.array(roots, dtype=np.int32),
+        'feature': np.concatenate(feature).astype(np.int32),
+        'threshold': np.concatenate(threshold).astype(np.float64),
+        'left': np.concatenate(left).astype(np.int32),
+        'right': np.concatenate(right).astype(np.int32),
+        'missing_left': np.concatenate(missing_left).astype(np.uint8),
+        'leaf_values': np.concatenate(leaf_values).reshape(n_leaves, n_classes),
+        'scaler_mean': np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64),
+        'scaler_scale': np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64)
+    }
+
+def export_model_artifact(clf, scaler, path=ARTIFACT_PATH):
+    """Write ``clf`` (a fitted RandomForestClassifier) and ``scaler`` to ``path``
+
+    The file is replaced atomically, so workers that still have the old one
+    mapped keep reading it until they reload. Returns its size in bytes.
+    """
+    arrays = _forest_arrays(clf, scaler)
+    header = {
+        'classes': [str(label) for label in clf.classes_],
+        'n_features': int(clf.n_features_in_),
+        'n_trees': len(clf.estimators_),
+        'n_nodes': len(arrays['feature']),
+        'arrays': {}
+    }
+
+    # Array offsets depend on the header's length, which depends on the
+    # offsets; reserving room for them up front settles it in one pass
+    specs = [(name, values.dtype.str, list(values.shape)) for name, values in arrays.items()]
+    placeholder = json.dumps({**header, 'arrays': {
+        name: {'offset': 2 ** 62, 'dtype': dtype, 'shape': shape} for name, dtype, shape in specs
+    }}).encode('utf-8')
+    offset = -(-(PREAMBLE.size + len(placeholder)) // ALIGNMENT) * ALIGNMENT
+    for name, dtype, shape in specs:
+        header['arrays'][name] = {'offset': offset, 'dtype': dtype, 'shape': shape}
+        offset += -(-arrays[name].nbytes // ALIGNMENT) * ALIGNMENT
+    header_bytes = json.dumps(header).encode('utf-8').ljust(len(placeholder))
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, values in arrays.items():
+            f.seek(header['arrays'][name]['offset'])
+            f.write(np.ascontiguousarray(values).tobytes())
+        f.truncate(offset)
+    os.replace(tmp_path, path)
+    return offset
+
+class ModelArtifact:
+    """A model artifact mapped read-only into memory
+
+    The arrays are views of the mapping, so opening one costs a few page
+    faults rather than a copy of the forest, and pages are shared with
+    every other process that maps the same file.
+    """
+
+    def __init__(self, path=ARTIFACT_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_length = PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a model artifact")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has format version {version}, expected {FORMAT_VERSION}; "
+                             f"re-export it with model_artifact.py")
+
+        header = json.loads(self._mmap[PREAMBLE.size:PREAMBLE.size + header_length])
+        self.classes = np.array(header['classes'])
+        self.n_features = header['n_features']
+        self.n_trees = header['n_trees']
+        self.n_nodes = header['n_nodes']
+        self.arrays = {}
+        for name, spec in header['arrays'].items():
+            shape = tuple(spec['shape'])
+            self.arrays[name] = np.frombuffer(
+                self._mmap, dtype=np.dtype(spec['dtype']),
+                count=int(np.prod(shape)), offset=spec['offset']
+            ).reshape(shape)
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['arrays'][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @property
+    def nbytes(self):
+        return len(self._mmap)
+
+def load_model_artifact(path=ARTIFACT_PATH):
+    return ModelArtifact(path)
+
+if __name__ == "__main__":
+    from train_classifier import MODEL_PATH, SCALER_PATH
+
+    parser = argparse.ArgumentParser(description="Export the saved classifier as a memory-mappable artifact")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--scaler', default=SCALER_PATH)
+    parser.add_argument('--output', default=ARTIFACT_PATH)
+    args = parser.parse_args()
+
+    import joblib
+    size = export_model_artifact(joblib.load(args.model), joblib.load(args.scaler), args.output)
+    artifact = ModelArtifact(args.output)
+    print(f"Wrote {args.output}: {artifact.n_trees} trees, {artifact.n_nodes} nodes, "
+          f"{size / 1024:.0f} KiB")
@@ -0,0 +1,235 @@
+# In-process pipeline runner: stages are declared with their dependencies,
+# each run in its own thread as soon as those have finished, and skipped,
+# make-style, when nothing they depend on changed since they last succeeded.
+import datetime
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from databases.instrumentation import metrics, carry_stages
+
+# What each stage last succeeded with, shared by every pipeline
+DEFAULT_STATE_PATH = 'models/pipeline_state.json'
+DEFAULT_JOBS = 4
+
+class Stage:
+    """One step of a pipeline
+
+    ``run`` is called without arguments once every stage named in ``deps``
+    has finished. The stage is up to date, and skipped, when it last
+    succeeded with the same fingerprint (``params`` and the size and
+    modification time of each file in ``inputs``), every file in
+    ``outputs`` exists, ``check`` (if given) returns True, and none of its
+    dependencies ran. ``params`` may be a callable returning JSON-
+    serializable values; it is called once the dependencies have finished.
+    """
+
+    def __init__(self, name, run, deps=(), inputs=(), params=None, outputs=(), check=None):
+        self.name = name
+        self.run = run
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.params = params
+        self.outputs = list(outputs)
+        self.check = check
+
+    def fingerprint(self):
+        params = self.params() if callable(self.params) else self.params
+        files = {}
+        for path in self.inputs:
+            try:
+                stat = os.stat(path)
+                files[path] = [stat.st_size, stat.st_mtime_ns]
+            except FileNotFoundError:
+                files[path] = None
+        content = json.dumps({'params': params, 'inputs': files}, sort_keys=True, default=str)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def __repr__(self):
+        return f"<Stage {self.name} deps={self.deps}>"
+
+class Pipeline:
+    """Stages run in dependency order, independent ones concurrently"""
+
+    def __init__(self, name, stages, state_path=DEFAULT_STATE_PATH):
+        self.name = name
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_path = state_path
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique")
+        for stage in stages:
+            missing = [dep for dep in stage.deps if dep not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages {missing}")
+        self.order = self._topological_order()
+
+    def _topological_order(self):
+        order = []
+        visiting = set()
+
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through stage {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _dependents(self, name):
+        """Every stage that depends on ``name``, directly or not"""
+        dependents = set()
+        for other in self.order:
+            if any(dep == name or dep in dependents for dep in self.stages[other].deps):
+                dependents.add(other)
+        return dependents
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _stale_reason(self, stage, fingerprint, recorded, ran_deps, force):
+        """Why ``stage`` has to run, or None if it is up to date"""
+        if force:
+            return "forced"
+        if ran_deps:
+            return f"{', '.join(ran_deps)} ran"
+        if recorded is None:
+            return "never ran"
+        if recorded['fingerprint'] != fingerprint:
+            return "inputs changed"
+        missing = [path for path in stage.outputs if not os.path.exists(path)]
+        if missing:
+            return f"{', '.join(missing)} missing"
+        if stage.check is not None and not stage.check():
+            return "check failed"
+        return None
+
+    def run(self, jobs=DEFAULT_JOBS, force=False):
+        """Run every stage that isn't up to date; returns stage name -> result
+
+        A result has the stage's ``status`` ('ran' or 'skipped'), and its
+        ``start`` and ``seconds`` relative to the start of the run. Stages
+        whose dependencies are done are started in up to ``jobs`` threads.
+        If a stage fails, no more are started and the error is re-raised
+        once the running ones finish.
+        """
+        if jobs < 1:
+            raise ValueError(f"jobs must be at least 1, got {jobs}")
+        state = self._load_state()
+        results = {}
+        running = {}
+        waiting = list(self.order)
+        failure = None
+        finished = queue.Queue()
+        start = time.perf_counter()
+
+        # Plain threads rather than a ThreadPoolExecutor: a process forked
+        # from an executor's thread (the feature report, ingest workers)
+        # fails on exit joining that thread
+        def run_stage(stage):
+            stage_start = time.perf_counter()
+            try:
+                with metrics.stage(f"{self.name}.{stage.name}"):
+                    stage.run()
+            except Exception as e:
+                finished.put((stage.name, e, stage_start - start, 0.0))
+            else:
+                finished.put((stage.name, None, stage_start - start, time.perf_counter() - stage_start))
+
+        with metrics.stage(self.name):
+            while waiting or running:
+                # Stages are visited in dependency order, so one pass starts
+                # or skips everything whose dependencies are done
+                for name in list(waiting) if failure is None else []:
+                    stage = self.stages[name]
+                    if len(running) >= jobs or any(dep not in results for dep in stage.deps):
+                        continue
+                    waiting.remove(name)
+                    ran_deps = [dep for dep in stage.deps if results[dep]['status'] == 'ran']
+                    fingerprint = stage.fingerprint()
+                    reason = self._stale_reason(stage, fingerprint, state.get(name), ran_deps, force)
+                    if reason is None:
+                        print(f"[{name}] up to date")
+                        results[name] = {'status': 'skipped', 'start': time.perf_counter() - start,
+                                         'seconds': 0.0}
+                        continue
+                    # Until it succeeds, neither the stage nor anything
+                    # downstream of it can be considered up to date
+                    for stale in {name} | self._dependents(name):
+                        state.pop(stale, None)
+                    self._save_state(state)
+                    print(f"[{name}] running ({reason})")
+                    running[name] = fingerprint
+                    threading.Thread(target=carry_stages(run_stage), args=(stage,),
+                                     name=f"stage-{name}").start()
+
+                if not running:
+                    break
+                name, error, stage_start, seconds = finished.get()
+                fingerprint = running.pop(name)
+                if error is not None:
+                    print(f"[{name}] failed: {error}")
+                    failure = failure or error
+                    continue
+                print(f"[{name}] done in {seconds:.1f}s")
+                results[name] = {'status': 'ran', 'start': stage_start, 'seconds': seconds}
+                state[name] = {
+                    'fingerprint': fingerprint,
+                    'completed_at': datetime.datetime.now().isoformat(timespec='seconds'),
+                    'seconds': seconds
+                }
+                self._save_state(state)
+
+        if failure is not None:
+            raise failure
+        return results
+
+    def critical_path(self, results):
+        """The chain of stages that ran and determined the run's wall time, first to last"""
+        ran = {name: result for name, result in results.items() if result['status'] == 'ran'}
+
+        def finish(name):
+            return ran[name]['start'] + ran[name]['seconds']
+
+        path = []
+        name = max(ran, key=finish, default=None)
+        while name is not None:
+            path.append(name)
+            name = max([dep for dep in self.stages[name].deps if dep in ran], key=finish, default=None)
+        return path[::-1]
+
+    def summary(self, results):
+        """Print each stage's timing and the critical path"""
+        print(f"\n{'stage':<20} {'status':<8} {'start':>8} {'seconds':>8}")
+        for name in sorted(results, key=lambda name: results[name]['start']):
+            result = results[name]
+            print(f"{name:<20} {result['status']:<8} {result['start']:>8.1f} {result['seconds']:>8.1f}")
+
+        path = self.critical_path(results)
+        if not path:
+            print("\nEvery stage was up to date")
+            return
+        wall = max(result['start'] + result['seconds'] for result in results.values())
+        busy = sum(result['seconds'] for result in results.values())
+        print(f"\nCritical path: {' -> '.join(path)} "
+              f"({sum(results[name]['seconds'] for name in path):.1f}s)")
+        print(f"Wall time {wall:.1f}s for {busy:.1f}s of stage time")
@@ -1,5 +1,16 @@
-import subprocess
-from databases.database import Session
+import argparse
+import os
+from pipeline_runner import Pipeline, Stage, DEFAULT_JOBS
+from databases.database import Session, engine
+from databases.instrumentation import metrics, DEFAULT_METRICS_PATH
+from databases.migrations import migrate, pending_migrations, MIGRATIONS
+from databases.process_teams_batch import process_teams_from_file
+from databases.aggregate_stats import update_team_stats
+from databases.reference_cache import ReferenceCache, DEFAULT_SNAPSHOT_PATH, reference_state
+from databases.team_files import DEFAULT_STATE_PATH, IngestState
+from feature_store import DEFAULT_STORE_DIR, FeatureStore, sync_feature_store
+from train_classifier import train_classifier, update_classifier, MODEL_PATH, SCALER_PATH, LEADERBOARD_PATH
+from model_artifact import ARTIFACT_PATH
 from sqlalchemy import text
 
 def clear_tables():
@@ -17,33 +28,115 @@ def clear_tables():
     finally:
         session.close()
 
-def run_script(script_name):
-    """Run a Python script and check for successful execution"""
-    try:
-        subprocess.run(['python', script_name], check=True)
-        print(f"Successfully completed {script_name}")
-    except subprocess.CalledProcessError as e:
-        print(f"Error running {script_name}: {e}")
-        raise
+TEAMS_FILE = 'databases/teams.txt'
 
-def main():
-    print("Starting classifier rebuild process...")
-    
-    # Step 1: Clear the database tables
-    clear_tables()
-    
-    # Step 2: Run the processing scripts in sequence
-    scripts = [
-        'databases/process_teams_batch.py',
-        'databases/aggregate_stats.py',
-        'train_classifier.py'
+def rebuild_stages(incremental=False, after=()):
+    """The rebuild's pipeline stages
+
+    The stages that read the reference tables (clearing, ingesting and the
+    reference snapshot) also wait for the stages named in ``after``. The
+    snapshot only needs the reference tables, so it is taken while the
+    teams are being ingested.
+    """
+    ingest_state = IngestState(DEFAULT_STATE_PATH)
+    store_meta = os.path.join(DEFAULT_STORE_DIR, 'meta.json')
+
+    def clear():
+        # The tables, and everything derived from them
+        clear_tables()
+        FeatureStore(DEFAULT_STORE_DIR).reset()
+        ingest_state.reset()
+
+    def ingest():
+        # Teams are aggregated at ingest; aggregate_stats only picks up
+        # anything that was missed
+        process_teams_from_file(TEAMS_FILE, aggregate=True, state=ingest_state)
+
+    def export():
+        sync_feature_store(FeatureStore(DEFAULT_STORE_DIR))
+
+    def train():
+        os.makedirs('models', exist_ok=True)
+        if incremental:
+            update_classifier(DEFAULT_STORE_DIR)
+        else:
+            train_classifier(DEFAULT_STORE_DIR)
+
+    def snapshot():
+        # Reference data snapshot used by serve_classifier.py
+        reference = ReferenceCache().load()
+        reference.save(DEFAULT_SNAPSHOT_PATH)
+        print(f"Wrote {reference} to {DEFAULT_SNAPSHOT_PATH}")
+
+    reads_reference = ['migrate', *after]
+    # Bring older databases up to the current schema (indexes, unique keys)
+    stages = [Stage('migrate', migrate, params=[entry[0] for entry in MIGRATIONS],
+                    check=lambda: not pending_migrations())]
+    if not incremental:
+        stages.append(Stage('clear', clear, deps=reads_reference, inputs=[TEAMS_FILE],
+                            params=reference_state))
+    stages += [
+        Stage('ingest', ingest, deps=reads_reference if incremental else ['clear'],
+              inputs=[TEAMS_FILE], params=reference_state),
+        Stage('aggregate', update_team_stats, deps=['ingest']),
+        Stage('export', export, deps=['aggregate'], outputs=[store_meta]),
+        # A new tuning run changes the settings train_classifier uses
+        Stage('train', train, deps=['export'], inputs=[LEADERBOARD_PATH],
+              outputs=[MODEL_PATH, SCALER_PATH, ARTIFACT_PATH]),
+        Stage('snapshot', snapshot, deps=reads_reference, params=reference_state,
+              outputs=[DEFAULT_SNAPSHOT_PATH])
     ]
-    
-    for script in scripts:
-        print(f"\nRunning {script}...")
-        run_script(script)
-    
+    return stages
+
+def main(incremental=False, jobs=DEFAULT_JOBS, force=False):
+    """Rebuild the team tables and classifier from TEAMS_FILE
+
+    With ``incremental=True`` only teams appended to TEAMS_FILE since the
+    last rebuild are ingested, aggregated and exported, and the classifier
+    gets trees for them instead of being retrained (unless
+    update_classifier decides it has drifted too far). If the file was
+    changed in any other way, a full rebuild is done instead.
+
+    Stages whose inputs haven't changed since they last succeeded are
+    skipped, unless ``force`` is set; changes made to the tables by other
+    means than this pipeline go unnoticed without it.
+    """
+    print("Starting classifier rebuild process...")
+
+    ingest_state = IngestState(DEFAULT_STATE_PATH)
+    if incremental and not ingest_state.exists():
+        print("No record of a previous ingest; doing a full rebuild")
+        incremental = False
+    elif incremental and not ingest_state.matches(TEAMS_FILE):
+        print(f"{TEAMS_FILE} was edited, not just appended to; doing a full rebuild")
+        incremental = False
+
+    pipeline = Pipeline('rebuild', rebuild_stages(incremental))
+    results = pipeline.run(jobs, force)
+    pipeline.summary(results)
+
     print("\nClassifier rebuild process completed successfully!")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Rebuild the team tables and playstyle classifier")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only process teams appended to the team file since the last rebuild")
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS,
+                        help="stages to run at the same time")
+    parser.add_argument('--force', action='store_true',
+                        help="run every stage, even those that are up to date")
+    parser.add_argument('--metrics', nargs='?', const=DEFAULT_METRICS_PATH, metavar='PATH',
+                        help="write every stage's timings and database round trips to PATH (JSON) and .prom")
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    if args.metrics:
+        metrics.enable(args.metrics, engine)
+    else:
+        metrics.enable_from_env(engine)
+    try:
+        main(args.incremental, args.jobs, args.force)
+    finally:
+        metrics.summary()
+        metrics.write()
@@ -0,0 +1,105 @@
+from multiprocessing import Process
+import argparse
+import os
+import numpy as np
+
+DEFAULT_REPORT_DIR = 'reports'
+# Plots use at most this many teams per playstyle; the correlations use all
+DEFAULT_MAX_ROWS_PER_CLASS = 2000
+
+FEATURE_NAMES = [
+    'HP', 'Offense', 'Defense', 'Sp.Defense',
+    'Speed', 'Recovery Moves', 'Defensive Items'
+]
+
+def downsample_per_class(X, y, max_rows_per_class, seed=42):
+    """Randomly keep at most ``max_rows_per_class`` rows of each class"""
+    X, y = np.asarray(X), np.asarray(y)
+    rng = np.random.default_rng(seed)
+    keep = []
+    for label in np.unique(y):
+        rows = np.flatnonzero(y == label)
+        if len(rows) > max_rows_per_class:
+            rows = np.sort(rng.choice(rows, size=max_rows_per_class, replace=False))
+        keep.append(rows)
+    keep = np.sort(np.concatenate(keep)) if keep else np.array([], dtype=np.intp)
+    return X[keep], y[keep]
+
+def render_report(X, y, output_dir=DEFAULT_REPORT_DIR,
+                  max_rows_per_class=DEFAULT_MAX_ROWS_PER_CLASS):
+    """Render the feature plots to PNG files in ``output_dir``
+
+    Uses the non-interactive Agg backend, so it never opens a window or
+    needs a display. Returns the paths written.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    import seaborn as sns
+
+    os.makedirs(output_dir, exist_ok=True)
+    # The style was renamed in matplotlib 3.6
+    plt.style.use('seaborn-v0_8' if 'seaborn-v0_8' in plt.style.available else 'seaborn')
+
+    X_sample, y_sample = downsample_per_class(X, y, max_rows_per_class)
+    df = pd.DataFrame(X_sample, columns=FEATURE_NAMES)
+    df['Playstyle'] = y_sample
+    paths = []
+
+    # Create violin plots for each feature
+    fig, axes = plt.subplots(3, 3, figsize=(15, 15))
+    axes = axes.ravel()
+    for idx, feature in enumerate(FEATURE_NAMES):
+        sns.violinplot(data=df, x='Playstyle', y=feature, ax=axes[idx])
+        axes[idx].tick_params(axis='x', labelrotation=45)
+        axes[idx].set_title(f'{feature} Distribution by Playstyle')
+    for ax in axes[len(FEATURE_NAMES):]:
+        fig.delaxes(ax)
+    fig.tight_layout()
+    paths.append(os.path.join(output_dir, 'feature_distributions.png'))
+    fig.savefig(paths[-1])
+    plt.close(fig)
+
+    fig = plt.figure(figsize=(10, 6))
+    sns.scatterplot(data=df, x='HP', y='Offense', hue='Playstyle', alpha=0.7)
+    plt.title('Team Offense vs HP by Playstyle')
+    plt.xlabel('HP')
+    plt.ylabel('Offense')
+    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    fig.tight_layout()
+    paths.append(os.path.join(output_dir, 'offense_vs_hp.png'))
+    fig.savefig(paths[-1])
+    plt.close(fig)
+
+    fig = plt.figure(figsize=(10, 8))
+    correlation_matrix = pd.DataFrame(np.asarray(X), columns=FEATURE_NAMES).corr()
+    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', center=0)
+    plt.title('Feature Correlation Heatmap')
+    fig.tight_layout()
+    paths.append(os.path.join(output_dir, 'feature_correlations.png'))
+    fig.savefig(paths[-1])
+    plt.close(fig)
+
+    return paths
+
+def start_report(X, y, output_dir=DEFAULT_REPORT_DIR,
+                 max_rows_per_class=DEFAULT_MAX_ROWS_PER_CLASS):
+    """Render the report in a background process; join() it when done"""
+    process = Process(target=render_report, args=(X, y, output_dir, max_rows_per_class),
+                      name='feature-report', daemon=True)
+    process.start()
+    return process
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the training data feature plots")
+    parser.add_argument('--feature-store', metavar='DIR',
+                        help="read the feature store in DIR instead of the database")
+    parser.add_argument('--output-dir', default=DEFAULT_REPORT_DIR)
+    parser.add_argument('--max-rows-per-class', type=int, default=DEFAULT_MAX_ROWS_PER_CLASS)
+    args = parser.parse_args()
+
+    from train_classifier import load_training_data
+    X, y, _ = load_training_data(args.feature_store)
+    for path in render_report(X, y, args.output_dir, args.max_rows_per_class):
+        print(f"Wrote {path}")
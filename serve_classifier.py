@@ -0,0 +1,221 @@
+from databases.reference_cache import ReferenceCache, DEFAULT_SNAPSHOT_PATH
+from databases.team_parser import team_features
+from classify import load_model, DEFAULT_MODEL_PATH, DEFAULT_SCALER_PATH
+from model_artifact import ARTIFACT_PATH
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import deque
+import argparse
+import json
+import queue
+import threading
+import time
+import numpy as np
+
+class LatencyStats:
+    """Request latency percentiles (over a sliding window) and throughput counters"""
+
+    def __init__(self, window=10000):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.client_errors = 0
+        self.server_errors = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def record_request(self, seconds, status=200):
+        with self.lock:
+            self.requests += 1
+            self.client_errors += 400 <= status < 500
+            self.server_errors += status >= 500
+            self.latencies.append(seconds)
+
+    def record_batch(self, size):
+        with self.lock:
+            self.batches += 1
+            self.batched_requests += size
+
+    def snapshot(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            requests = self.requests
+            client_errors, server_errors = self.client_errors, self.server_errors
+            batches, batched = self.batches, self.batched_requests
+        uptime = time.time() - self.started
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+
+        return {
+            'requests': requests,
+            'errors': client_errors + server_errors,
+            'client_errors': client_errors,
+            'server_errors': server_errors,
+            'batches': batches,
+            'mean_batch_size': batched / batches if batches else 0.0,
+            'uptime_seconds': uptime,
+            'requests_per_second': requests / uptime if uptime > 0 else 0.0,
+            'latency_p50_ms': percentile(50),
+            'latency_p99_ms': percentile(99)
+        }
+
+class MicroBatcher:
+    """Coalesces concurrent classification requests into one predict_proba call
+
+    A batch is closed when it reaches ``max_batch`` requests or when the
+    oldest request in it has waited ``max_wait_ms``.
+    """
+
+    def __init__(self, model, stats, max_batch=64, max_wait_ms=2.0):
+        self.model = model
+        self.stats = stats
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def predict(self, features):
+        """Class probabilities for one feature vector; blocks until its batch runs"""
+        pending = {'features': features, 'done': threading.Event()}
+        self.requests.put(pending)
+        pending['done'].wait()
+        if 'error' in pending:
+            raise pending['error']
+        return pending['probabilities']
+
+    def _run(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                X = np.array([pending['features'] for pending in batch], dtype=float)
+                probabilities = self.model.predict_proba(X)
+                for pending, row in zip(batch, probabilities):
+                    pending['probabilities'] = row
+            except Exception as e:
+                for pending in batch:
+                    pending['error'] = e
+            self.stats.record_batch(len(batch))
+            for pending in batch:
+                pending['done'].set()
+
+class ClassifierServer(ThreadingHTTPServer):
+    # The socketserver default backlog of 5 resets bursts of concurrent clients
+    request_queue_size = 128
+
+def make_handler(batcher, reference, classes, stats):
+    class ClassifierHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_error(self, start, status, error):
+            stats.record_request(time.perf_counter() - start, status)
+            self._send_json(status, {'error': str(error)})
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                self._send_json(200, stats.snapshot())
+            elif self.path == '/health':
+                self._send_json(200, {'status': 'ok'})
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/classify':
+                self._send_json(404, {'error': 'not found'})
+                return
+
+            start = time.perf_counter()
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                if length < 0:
+                    raise ValueError(f"Invalid Content-Length {length}")
+                team_text = self.rfile.read(length).decode('utf-8')
+                warnings = []
+                features = team_features(team_text, reference, warnings)
+                if features[0] is None:
+                    raise ValueError("None of the team's Pokemon were recognized")
+            except ValueError as e:
+                # Bad request: includes UnicodeDecodeError and TeamParseError
+                self._send_error(start, 400, e)
+                return
+            except Exception as e:
+                self._send_error(start, 500, e)
+                return
+
+            try:
+                probabilities = batcher.predict(features)
+            except Exception as e:
+                # The model or the batcher failed, not the request
+                self._send_error(start, 500, e)
+                return
+
+            best = int(np.argmax(probabilities))
+            stats.record_request(time.perf_counter() - start)
+            self._send_json(200, {
+                'playstyle': classes[best],
+                'probabilities': dict(zip(classes, map(float, probabilities))),
+                'warnings': warnings
+            })
+
+    return ClassifierHandler
+
+def serve(host='127.0.0.1', port=8000, model_path=DEFAULT_MODEL_PATH,
+          scaler_path=DEFAULT_SCALER_PATH, reference_path=DEFAULT_SNAPSHOT_PATH,
+          max_batch=64, max_wait_ms=2.0, artifact_path=ARTIFACT_PATH):
+    """Load the model once and serve POST /classify and GET /metrics"""
+    model = load_model(model_path, scaler_path, artifact_path)
+    reference = ReferenceCache.from_snapshot(reference_path)
+    classes = [str(c) for c in model.classes_]
+
+    stats = LatencyStats()
+    batcher = MicroBatcher(model, stats, max_batch, max_wait_ms)
+    server = ClassifierServer((host, port), make_handler(batcher, reference, classes, stats))
+    print(f"Serving {len(classes)} playstyles on http://{host}:{port} "
+          f"(POST /classify, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve playstyle predictions over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--scaler', default=DEFAULT_SCALER_PATH)
+    parser.add_argument('--artifact', default=ARTIFACT_PATH,
+                        help="model artifact for the forest engine ('' to use the joblib model)")
+    parser.add_argument('--reference', default=DEFAULT_SNAPSHOT_PATH,
+                        help="reference data snapshot (python -m databases.reference_cache)")
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.model, args.scaler, args.reference,
+          args.max_batch, args.max_wait_ms, args.artifact)
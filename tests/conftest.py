@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+
+# The tests import the top-level modules and the databases package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from databases.reference_cache import ReferenceCache, PokemonRecord, MoveRecord, ItemRecord
+
+SAMPLE_TEAM = """Playstyle: Stall
+Gliscor (F) @ Toxic Orb
+Ability: Poison Heal
+EVs: 244 HP / 88 Def / 176 Spe
+Impish Nature
+- Earthquake
+- Protect
+
+Skarmory @ Leftovers
+Ability: Sturdy
+EVs: 252 HP / 4 Def / 252 SpD
+Careful Nature
+IVs: 0 Atk
+- Roost
+- Spikes
+"""
+
+@pytest.fixture
+def reference():
+    """A small in-memory ReferenceCache with SAMPLE_TEAM's Pokemon, moves and items"""
+    cache = ReferenceCache()
+    cache.pokemon = {
+        'gliscor': PokemonRecord(1, 75, 95, 125, 45, 75, 95),
+        'skarmory': PokemonRecord(2, 65, 80, 140, 40, 70, 70)
+    }
+    cache.moves = {
+        'earthquake': MoveRecord(1, False),
+        'protect': MoveRecord(2, False),
+        'roost': MoveRecord(3, True),
+        'spikes': MoveRecord(4, False)
+    }
+    cache.items = {
+        'toxic-orb': ItemRecord(1, False),
+        'leftovers': ItemRecord(2, True)
+    }
+    cache.loaded = True
+    return cache
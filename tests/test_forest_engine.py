@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from forest_engine import ForestEngine
+from model_artifact import ModelArtifact, export_model_artifact
+
+TOLERANCE = 1e-12
+
+def _dataset(rng, n, missing=0.1):
+    X = rng.normal(size=(n, 7)) * [300, 200, 250, 250, 150, 2, 3] + [600, 500, 500, 500, 450, 2, 2]
+    y = np.array(['Offense', 'Balance', 'Stall'])[(X[:, 1] > 500).astype(int) + (X[:, 5] > 2)]
+    X[rng.random(X.shape) < missing] = np.nan
+    return X, y
+
+def _engine(clf, scaler, tmp_path):
+    path = str(tmp_path / 'model.forest')
+    export_model_artifact(clf, scaler, path)
+    return ForestEngine(ModelArtifact(path))
+
+def _fit(X, y, **params):
+    scaler = StandardScaler().fit(X)
+    clf = RandomForestClassifier(random_state=0, **params).fit(scaler.transform(X), y)
+    return clf, scaler
+
+def test_matches_predict_proba_with_missing_features(tmp_path):
+    rng = np.random.default_rng(0)
+    X, y = _dataset(rng, 2000)
+    clf, scaler = _fit(X, y, n_estimators=25, class_weight='balanced')
+    engine = _engine(clf, scaler, tmp_path)
+
+    X_test, _ = _dataset(rng, 3000, missing=0.2)
+    expected = clf.predict_proba(scaler.transform(X_test))
+    assert np.abs(engine.predict_proba(X_test) - expected).max() <= TOLERANCE
+    assert list(engine.predict(X_test)) == list(clf.predict(scaler.transform(X_test)))
+
+def test_matches_a_warm_started_forest(tmp_path):
+    rng = np.random.default_rng(1)
+    X, y = _dataset(rng, 1500)
+    clf, scaler = _fit(X, y, n_estimators=10, max_depth=8)
+    # Trees added on new data, the way update_classifier grows the forest
+    X_new, y_new = _dataset(rng, 500)
+    clf.set_params(warm_start=True, n_estimators=16)
+    clf.fit(scaler.transform(X_new), y_new)
+    engine = _engine(clf, scaler, tmp_path)
+
+    X_test, _ = _dataset(rng, 2000)
+    expected = clf.predict_proba(scaler.transform(X_test))
+    assert engine.n_trees == 16
+    assert np.abs(engine.predict_proba(X_test) - expected).max() <= TOLERANCE
+
+def test_rejects_rows_of_the_wrong_width(tmp_path):
+    rng = np.random.default_rng(2)
+    X, y = _dataset(rng, 200, missing=0)
+    engine = _engine(*_fit(X, y, n_estimators=3), tmp_path)
+    with pytest.raises(ValueError):
+        engine.predict_proba(X[:, :5])
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from databases.instrumentation import Metrics, carry_stages, METRICS_ENV, RUN_ENV
+
+@pytest.fixture
+def metrics(tmp_path, monkeypatch):
+    # enable() exports these for child scripts; keep them out of other tests
+    monkeypatch.setenv(METRICS_ENV, '')
+    monkeypatch.setenv(RUN_ENV, '')
+    engine = create_engine('sqlite://')
+    return Metrics().enable(str(tmp_path / 'metrics.json'), engine), engine
+
+def _run_statements(engine, count):
+    with engine.connect() as conn:
+        for _ in range(count):
+            conn.execute(text('SELECT 1'))
+
+def test_concurrent_stages_count_only_their_own_statements(metrics):
+    metrics, engine = metrics
+    both_open = threading.Barrier(2)
+
+    def stage(name, count):
+        with metrics.stage(name):
+            both_open.wait()
+            _run_statements(engine, count)
+            both_open.wait()
+
+    threads = [threading.Thread(target=stage, args=('populate_a', 3)),
+               threading.Thread(target=stage, args=('populate_b', 5))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert metrics.stages['populate_a']['statements'] == 3
+    assert metrics.stages['populate_b']['statements'] == 5
+
+def test_nested_stages_include_inner_statements(metrics):
+    metrics, engine = metrics
+    with metrics.stage('ingest'):
+        _run_statements(engine, 1)
+        with metrics.stage('ingest.db'):
+            _run_statements(engine, 2)
+
+    assert metrics.stages['ingest']['statements'] == 3
+    assert metrics.stages['ingest.db']['statements'] == 2
+
+def test_carried_thread_counts_towards_the_starting_stage(metrics):
+    metrics, engine = metrics
+
+    def work():
+        with metrics.stage('setup.populate'):
+            _run_statements(engine, 2)
+
+    with metrics.stage('setup'):
+        thread = threading.Thread(target=carry_stages(work))
+        thread.start()
+        thread.join()
+        # Not carried: counts only in stages it opens itself
+        thread = threading.Thread(target=_run_statements, args=(engine, 4))
+        thread.start()
+        thread.join()
+
+    assert metrics.stages['setup']['statements'] == 2
+    assert metrics.stages['setup.populate']['statements'] == 2
@@ -0,0 +1,25 @@
+import pytest
+
+from pipeline_runner import Pipeline, Stage
+
+def test_rejects_fewer_than_one_job(tmp_path):
+    pipeline = Pipeline('test', [Stage('only', lambda: None)],
+                        state_path=str(tmp_path / 'state.json'))
+    for jobs in (0, -1):
+        with pytest.raises(ValueError):
+            pipeline.run(jobs)
+
+def test_runs_stages_in_dependency_order(tmp_path):
+    ran = []
+    pipeline = Pipeline('test', [
+        Stage('second', lambda: ran.append('second'), deps=['first']),
+        Stage('first', lambda: ran.append('first'))
+    ], state_path=str(tmp_path / 'state.json'))
+
+    results = pipeline.run(jobs=2)
+
+    assert ran == ['first', 'second']
+    assert {name: result['status'] for name, result in results.items()} == \
+        {'first': 'ran', 'second': 'ran'}
+    # Nothing changed, so a second run skips both
+    assert {result['status'] for result in pipeline.run(jobs=2).values()} == {'skipped'}
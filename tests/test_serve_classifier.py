@@ -0,0 +1,65 @@
+import http.client
+import threading
+
+import pytest
+
+from conftest import SAMPLE_TEAM
+from serve_classifier import ClassifierServer, LatencyStats, make_handler
+
+class FakeBatcher:
+    def __init__(self, error=None):
+        self.error = error
+
+    def predict(self, features):
+        if self.error:
+            raise self.error
+        return [0.25, 0.75]
+
+@pytest.fixture
+def serve(reference):
+    servers = []
+
+    def start(batcher):
+        stats = LatencyStats()
+        server = ClassifierServer(('127.0.0.1', 0),
+                                  make_handler(batcher, reference, ['Offense', 'Stall'], stats))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server.server_address[1], stats
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def _post(port, body, headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    conn.putrequest('POST', '/classify')
+    for name, value in (headers or {'Content-Length': str(len(body))}).items():
+        conn.putheader(name, value)
+    conn.endheaders(body)
+    status = conn.getresponse().status
+    conn.close()
+    return status
+
+def test_classifies_a_team(serve):
+    port, stats = serve(FakeBatcher())
+    assert _post(port, SAMPLE_TEAM.encode('utf-8')) == 200
+    assert stats.snapshot()['errors'] == 0
+
+def test_malformed_requests_are_client_errors(serve):
+    port, stats = serve(FakeBatcher())
+    assert _post(port, b'\xff\xfe') == 400
+    assert _post(port, b'', {'Content-Length': 'abc'}) == 400
+    assert _post(port, b'', {'Content-Length': '-5'}) == 400
+    assert _post(port, b'Playstyle: Stall\n- Roost') == 400
+
+    snapshot = stats.snapshot()
+    assert (snapshot['client_errors'], snapshot['server_errors']) == (4, 0)
+
+def test_prediction_failures_are_server_errors(serve):
+    port, stats = serve(FakeBatcher(RuntimeError("model failed")))
+    assert _post(port, SAMPLE_TEAM.encode('utf-8')) == 500
+
+    snapshot = stats.snapshot()
+    assert (snapshot['client_errors'], snapshot['server_errors']) == (0, 1)
@@ -0,0 +1,121 @@
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import SAMPLE_TEAM
+from databases import team_parser
+from databases.team_parser import (
+    calculate_hp, calculate_stat, compute_stats_batch, parse_team_text, prepare_teams,
+    TeamParseError, DEFAULT_IVS, NATURE_MODIFIERS, NATURE_NAMES, STAT_NAMES, MAX_EV, MAX_IV
+)
+
+def test_parse_team_text():
+    team = parse_team_text(SAMPLE_TEAM + """
+Pretty (Meowstic) (F) @ Light Clay
+- Reflect
+""")
+
+    assert team['playstyle'] == 'Stall'
+    gliscor, skarmory, meowstic = team['pokemon']
+    assert gliscor == {
+        'name': 'gliscor',
+        'item': 'Toxic Orb',
+        'moves': ['- Earthquake', '- Protect'],
+        'evs': {'hp': 244, 'attack': 0, 'defense': 88, 'sp_attack': 0, 'sp_defense': 0, 'speed': 176},
+        'ivs': {},
+        'nature': 'Impish'
+    }
+    assert skarmory['nature'] == 'Careful'
+    assert skarmory['ivs'] == dict(DEFAULT_IVS, attack=0)
+    assert skarmory['moves'] == ['- Roost', '- Spikes']
+    assert meowstic == {
+        'name': 'meowstic-female',
+        'item': 'Light Clay',
+        'moves': ['- Reflect'],
+        'evs': {},
+        'ivs': {},
+        'nature': 'Serious'
+    }
+
+def test_parse_team_text_copies_cached_spreads():
+    first = parse_team_text(SAMPLE_TEAM)
+    first['pokemon'][0]['evs']['hp'] = 0
+    assert parse_team_text(SAMPLE_TEAM)['pokemon'][0]['evs']['hp'] == 244
+
+@pytest.mark.parametrize('team_text, line, reason', [
+    (SAMPLE_TEAM.replace('EVs: 252 HP', 'EVs: x HP'), 11, "EVs value 'x' is not a number"),
+    (SAMPLE_TEAM.replace('IVs: 0 Atk', 'IVs: 0 Foo'), 13, "unknown stat 'Foo' in IVs"),
+    (SAMPLE_TEAM.replace('Gliscor (F) @ Toxic Orb\n', ''), 3, "expected a Pokemon ('<name> @ <item>') before its details"),
+    (SAMPLE_TEAM.replace('Playstyle: Stall', 'Stall'), 1, "expected 'Playstyle: <playstyle>'"),
+    ('\n  \n' + SAMPLE_TEAM.replace('Impish Nature', 'EVs: 4'), 7, "expected '<value> <stat>' in EVs, got '4'"),
+    ('\n\nStall\n', 3, "expected 'Playstyle: <playstyle>'"),
+])
+def test_parse_team_text_error_lines(team_text, line, reason):
+    with pytest.raises(TeamParseError) as info:
+        parse_team_text(team_text)
+    assert (info.value.line, info.value.reason) == (line, reason)
+    assert str(info.value) == f"line {line}: {reason}"
+
+def test_line_cache_is_per_thread():
+    parse_team_text(SAMPLE_TEAM)
+    main_cache = team_parser._line_cache()
+    assert '- Roost' in main_cache
+
+    caches = []
+    thread = threading.Thread(target=lambda: caches.append(team_parser._line_cache()))
+    thread.start()
+    thread.join()
+    assert caches[0] is not main_cache and not caches[0]
+
+def test_line_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(team_parser, '_MAX_CACHED_LINES', 4)
+    parse_team_text(SAMPLE_TEAM)
+    cache = team_parser._line_cache()
+    assert len(cache) == 0
+    assert parse_team_text(SAMPLE_TEAM)['pokemon'][1]['name'] == 'skarmory'
+
+def _scalar_stats(base, evs, ivs, nature):
+    """Stats the way process_team computed them before compute_stats_batch"""
+    modifiers = NATURE_MODIFIERS.get(NATURE_NAMES[nature], {})
+    stats = [calculate_hp(base[0], evs[0], ivs[0])]
+    for i, stat in enumerate(STAT_NAMES[1:], 1):
+        nature_mod = 1.1 if modifiers.get('increased') == stat else \
+            0.9 if modifiers.get('decreased') == stat else 1.0
+        stats.append(calculate_stat(base[i], evs[i], ivs[i], nature_mod=nature_mod))
+    return stats
+
+def test_compute_stats_batch_matches_the_scalar_functions():
+    rng = np.random.default_rng(0)
+    n = 20000
+    base = rng.integers(1, 256, size=(n, len(STAT_NAMES)))
+    evs = rng.integers(0, MAX_EV + 1, size=(n, len(STAT_NAMES)))
+    ivs = rng.integers(0, MAX_IV + 1, size=(n, len(STAT_NAMES)))
+    natures = rng.integers(0, len(NATURE_NAMES), size=n)
+    # Every combination of the EV and IV limits, for every nature
+    for row, (ev, iv) in enumerate([(0, 0), (0, MAX_IV), (MAX_EV, 0), (MAX_EV, MAX_IV)] * len(NATURE_NAMES)):
+        evs[row], ivs[row], natures[row] = ev, iv, row // 4
+
+    batch = compute_stats_batch(base, evs, ivs, natures)
+
+    expected = [_scalar_stats(b, e, i, nature)
+                for b, e, i, nature in zip(base.tolist(), evs.tolist(), ivs.tolist(), natures.tolist())]
+    assert batch.tolist() == expected
+
+def _record(name, team_text):
+    return {'format': 'gen9ou', 'team_name': name, 'team_text': team_text}
+
+def test_prepare_teams_quarantines_out_of_range_evs(reference):
+    bad_evs = SAMPLE_TEAM.replace('EVs: 244 HP / 88 Def / 176 Spe', 'EVs: 99999999999999999999 HP')
+    bad_ivs = SAMPLE_TEAM.replace('IVs: 0 Atk', 'IVs: 32 Atk')
+    quarantine = []
+
+    prepared = prepare_teams([
+        _record('good', SAMPLE_TEAM), _record('bad-evs', bad_evs), _record('bad-ivs', bad_ivs)
+    ], reference, quarantine, warnings=[])
+
+    assert [team['team_name'] for team, _, _ in prepared] == ['good']
+    assert [team['team_name'] for team in quarantine] == ['bad-evs', 'bad-ivs']
+    assert 'EVs' in quarantine[0]['error'] and 'IVs' in quarantine[1]['error']
+    # The good team's stats are still computed
+    assert all(row['hp'] is not None for row in prepared[0][2])
@@ -1,97 +1,128 @@
-from databases.database import Session, Team
+from databases.team_parser import FEATURE_COLUMNS
+from databases.instrumentation import metrics, DEFAULT_METRICS_PATH
+from feature_store import FeatureStore, sync_feature_store
+from report import start_report, DEFAULT_REPORT_DIR, DEFAULT_MAX_ROWS_PER_CLASS
+from model_artifact import export_model_artifact, ARTIFACT_PATH
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
 import joblib
+import json
 import os
+import warnings
 
-def load_team_data():
-    """Load team data from database and prepare for classification"""
+LOAD_CHUNK_SIZE = 10000
+
+MODEL_PATH = 'models/random_forest_classifier.joblib'
+SCALER_PATH = 'models/scaler.joblib'
+# Which feature store rows the saved model was trained on
+TRAINING_STATE_PATH = 'models/training_state.json'
+
+N_ESTIMATORS = 100
+# update_classifier retrains from scratch instead of adding trees when the
+# new teams are more than this fraction of those already trained on...
+MAX_DELTA_FRACTION = 0.25
+# ...when a feature's mean over the new teams is this many standard
+# deviations from the training mean...
+DRIFT_THRESHOLD = 0.5
+# ...or when the forest would grow past this many trees
+MAX_ESTIMATORS = 300
+# Written by tune_classifier.py; its best settings replace the defaults below
+LEADERBOARD_PATH = 'models/tuning_leaderboard.json'
+DEFAULT_PARAMS = {'n_estimators': N_ESTIMATORS, 'class_weight': 'balanced'}
+
+def load_team_data(chunk_size=LOAD_CHUNK_SIZE, min_class_size=2):
+    """Load team data from database and prepare for classification
+
+    Playstyles with fewer than ``min_class_size`` teams are filtered out in
+    SQL, and only the feature columns and label are selected. Rows are
+    streamed ``chunk_size`` at a time into a preallocated float array, so
+    peak memory stays close to the size of the returned matrix.
+    """
+    # Imported here so training from the feature store never opens a connection
+    from databases.database import Session, Team, engine
+    from sqlalchemy import select, func
+
+    metrics.watch(engine)
     session = Session()
-    
-    teams = session.query(Team).filter(Team.playstyle.isnot(None)).all()
-    
-    features = []
-    targets = []
-    
-    playstyle_counts = {}
-    for team in teams:
-        if team.playstyle not in playstyle_counts:
-            playstyle_counts[team.playstyle] = 0
-        playstyle_counts[team.playstyle] += 1
-    
-    for team in teams:
-        if playstyle_counts[team.playstyle] >= 2:
-            features.append([
-                team.team_hp,
-                team.team_offense,
-                team.team_defense,
-                team.team_spdef,
-                team.team_speed,
-                team.recovery_moves,
-                team.defensive_items
-            ])
-            targets.append(team.playstyle)
-    
-    session.close()
-    
-    return np.array(features), np.array(targets)
+    try:
+        playstyles = select(Team.playstyle).where(
+            Team.playstyle.isnot(None)
+        ).group_by(Team.playstyle).having(func.count() >= min_class_size)
+        labelled = Team.playstyle.in_(playstyles)
 
-def visualize_features(X, y):
-    """Create visualizations of the features across different playstyles"""
-    feature_names = [
-        'HP', 'Offense', 'Defense', 'Sp.Defense', 
-        'Speed', 'Recovery Moves', 'Defensive Items'
-    ]
-    df = pd.DataFrame(X, columns=feature_names)
-    df['Playstyle'] = y
+        # Teams added while loading are left for the next run
+        total, last_team_id = session.execute(
+            select(func.count(), func.max(Team.team_id)).where(labelled)
+        ).one()
 
-    plt.style.use('seaborn')
-    
-    # Create violin plots for each feature
-    fig, axes = plt.subplots(3, 3, figsize=(15, 15))
-    axes = axes.ravel()
-    
-    for idx, feature in enumerate(feature_names):
-        sns.violinplot(data=df, x='Playstyle', y=feature, ax=axes[idx])
-        axes[idx].set_xticklabels(axes[idx].get_xticklabels(), rotation=45, ha='right')
-        axes[idx].set_title(f'{feature} Distribution by Playstyle')
-    
+        X = np.empty((total, len(FEATURE_COLUMNS)), dtype=np.float64)
+        codes = np.empty(total, dtype=np.int32)
+        classes = {}
 
-    if len(feature_names) < 9:
-        fig.delaxes(axes[-1])
-    
-    plt.tight_layout()
-    plt.show()
-    
+        stmt = select(
+            *[getattr(Team, column) for column in FEATURE_COLUMNS], Team.playstyle
+        ).where(
+            labelled, Team.team_id <= last_team_id
+        ).order_by(Team.team_id).execution_options(yield_per=chunk_size)
 
-    plt.figure(figsize=(10, 6))
-    sns.scatterplot(data=df, x='HP', y='Offense', hue='Playstyle', alpha=0.7)
-    plt.title('Team Offense vs HP by Playstyle')
-    plt.xlabel('HP')
-    plt.ylabel('Offense')
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.show()
-    
-    plt.figure(figsize=(10, 8))
-    correlation_matrix = df[feature_names].corr()
-    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', center=0)
-    plt.title('Feature Correlation Heatmap')
-    plt.tight_layout()
-    plt.show()
+        filled = 0
+        for rows in session.execute(stmt).partitions():
+            # Teams deleted while loading leave the tail of the array unused
+            rows = rows[:total - filled]
+            X[filled:filled + len(rows)] = [row[:-1] for row in rows]
+            codes[filled:filled + len(rows)] = [
+                classes.setdefault(row[-1], len(classes)) for row in rows
+            ]
+            filled += len(rows)
+    finally:
+        session.close()
 
-def train_classifier():
+    return X[:filled], np.array(list(classes))[codes[:filled]]
 
-    X, y = load_team_data()
-    
+@metrics.timed('train.load')
+def load_training_data(feature_store=None):
+    """``(X, y, store)`` from the feature store directory, or the database
+
+    The feature store is exported first if it doesn't exist yet; ``store``
+    is None when loading from the database.
+    """
+    if not feature_store:
+        X, y = load_team_data()
+        return X, y, None
+    store = FeatureStore(feature_store)
+    if not store.exists():
+        sync_feature_store(store)
+    X, y = store.training_data()
+    return X, y, store
 
-    visualize_features(X, y)
+def classifier_params():
+    """RandomForestClassifier settings: the last tuning run's best, or DEFAULT_PARAMS"""
+    try:
+        with open(LEADERBOARD_PATH, 'r') as f:
+            tuned = json.load(f)['best_params']
+    except (FileNotFoundError, ValueError, KeyError):
+        return dict(DEFAULT_PARAMS)
+    print(f"Using the tuned settings in {LEADERBOARD_PATH}: {tuned}")
+    return {**DEFAULT_PARAMS, **tuned}
+
+def train_classifier(feature_store=None, report_dir=DEFAULT_REPORT_DIR,
+                     report_max_rows=DEFAULT_MAX_ROWS_PER_CLASS):
+    """Train and save the classifier
+
+    With a ``feature_store`` directory the training data comes from the
+    feature store (exported first if it doesn't exist yet) instead of the
+    database. Unless ``report_dir`` is None, the feature plots are rendered
+    there by a background process while the model trains. The forest uses
+    classifier_params(), so retraining keeps any tuned settings.
+    """
+    X, y, store = load_training_data(feature_store)
+
+    report = start_report(X, y, report_dir, report_max_rows) if report_dir else None
 
     unique, counts = np.unique(y, return_counts=True)
     print("\nClass distribution:")
@@ -110,8 +141,9 @@ def train_classifier():
     X_test_scaled = scaler.transform(X_test)
     
 
-    clf = RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced')
-    clf.fit(X_train_scaled, y_train)
+    clf = RandomForestClassifier(random_state=42, **classifier_params())
+    with metrics.stage('train.fit', len(X_train)):
+        clf.fit(X_train_scaled, y_train)
     
 
     y_pred = clf.predict(X_test_scaled)
@@ -132,16 +164,154 @@ def train_classifier():
     print(importance.sort_values('importance', ascending=False))
     
     # Save the trained models
-    joblib.dump(clf, 'models/random_forest_classifier.joblib')
-    joblib.dump(scaler, 'models/scaler.joblib')
+    save_model(clf, scaler, store)
+
+    if report is not None:
+        report.join()
+        if report.exitcode == 0:
+            print(f"\nFeature report written to {report_dir}/")
+        else:
+            print(f"\nFeature report failed (exit code {report.exitcode})")
     
     '''To use the models,import joblib
        clf = joblib.load('models/random_forest_classifier.joblib')
-       scaler = joblib.load('models/scaler.joblib')'''
+       scaler = joblib.load('models/scaler.joblib')
+       or map models/random_forest_classifier.forest with model_artifact.ModelArtifact'''
+    return clf, scaler
+
+@metrics.timed('train.save')
+def save_model(clf, scaler, store=None):
+    """Save the model and scaler, their memory-mappable artifact and the training state"""
+    joblib.dump(clf, MODEL_PATH)
+    joblib.dump(scaler, SCALER_PATH)
+    export_model_artifact(clf, scaler, ARTIFACT_PATH)
+    _write_training_state(store)
+
+def _write_training_state(store):
+    """Record which feature store rows the saved model was trained on"""
+    if store is None:
+        # Trained from the database: nothing for update_classifier to build on
+        if os.path.exists(TRAINING_STATE_PATH):
+            os.remove(TRAINING_STATE_PATH)
+        return
+    with open(TRAINING_STATE_PATH, 'w') as f:
+        json.dump({
+            'store_created_at': store.meta['created_at'],
+            'trained_count': store.count
+        }, f)
+
+def update_classifier(feature_store, report_dir=DEFAULT_REPORT_DIR,
+                      report_max_rows=DEFAULT_MAX_ROWS_PER_CLASS):
+    """Update the saved classifier with teams exported since it was trained
+
+    New trees are added with ``warm_start``, fitted on the new teams plus an
+    equal-sized sample of older ones, so the cost grows with the number of
+    new teams rather than the whole dataset. The scaler is kept as is. Falls
+    back to train_classifier when there is no model to build on, the new
+    teams add a playstyle, or a MAX_DELTA_FRACTION, DRIFT_THRESHOLD or
+    MAX_ESTIMATORS limit is crossed; ``report_dir`` and ``report_max_rows``
+    are passed on to it.
+    """
+    store = FeatureStore(feature_store)
+    if not store.exists():
+        sync_feature_store(store)
+
+    def retrain(reason):
+        print(f"Retraining from scratch: {reason}")
+        return train_classifier(feature_store, report_dir, report_max_rows)
+
+    try:
+        with open(TRAINING_STATE_PATH, 'r') as f:
+            state = json.load(f)
+        clf = joblib.load(MODEL_PATH)
+        scaler = joblib.load(SCALER_PATH)
+    except FileNotFoundError:
+        return retrain("no model trained from the feature store to update")
+
+    trained = state['trained_count']
+    if state['store_created_at'] != store.meta['created_at'] or store.count < trained:
+        return retrain("the feature store was rebuilt")
+    if store.count == trained:
+        print("No new teams since the classifier was last trained")
+        return clf, scaler
+
+    _, features, codes = store.load()
+    classes = np.array(store.meta['classes'])
+    X_new = np.asarray(features[trained:])
+    y_new = classes[codes[trained:]]
+    # Trees in proportion to the forest in use, which may have been tuned
+    added_trees = max(1, round(clf.n_estimators * len(X_new) / trained))
+
+    new_playstyles = sorted(set(map(str, y_new)) - set(map(str, clf.classes_)))
+    if new_playstyles:
+        return retrain(f"new playstyles {', '.join(new_playstyles)}")
+    if len(X_new) > MAX_DELTA_FRACTION * trained:
+        return retrain(f"{len(X_new)} new teams against {trained} trained on")
+    with np.errstate(invalid='ignore'):
+        drift = np.abs(np.nanmean(X_new, axis=0) - scaler.mean_) / scaler.scale_
+    if np.nanmax(drift, initial=0) > DRIFT_THRESHOLD:
+        column = FEATURE_COLUMNS[int(np.nanargmax(drift))]
+        return retrain(f"{column} drifted by {np.nanmax(drift):.2f} standard deviations")
+    if clf.n_estimators + added_trees > MAX_ESTIMATORS:
+        return retrain(f"the forest would grow past {MAX_ESTIMATORS} trees")
+
+    print(f"Accuracy on the {len(X_new)} new teams before updating: "
+          f"{clf.score(scaler.transform(X_new), y_new):.3f}")
+
+    # Older teams of the playstyles the forest knows, sampled to match the
+    # new ones. Every known playstyle has to be present, or fit() would
+    # renumber the classes under the existing trees.
+    known = np.flatnonzero(np.isin(classes, clf.classes_))
+    old_rows = np.flatnonzero(np.isin(codes[:trained], known))
+    rng = np.random.default_rng(trained)
+    sample = rng.choice(old_rows, size=min(len(old_rows), len(X_new)), replace=False)
+    present = set(codes[sample]) | set(codes[trained:])
+    missing = [old_rows[codes[old_rows] == code][0] for code in known if code not in present]
+    rows = np.concatenate([sample, np.array(missing, dtype=sample.dtype)])
+
+    X_fit = np.concatenate([np.asarray(features[rows]), X_new])
+    y_fit = np.concatenate([classes[codes[rows]], y_new])
+
+    clf.set_params(warm_start=True, n_estimators=clf.n_estimators + added_trees)
+    with warnings.catch_warnings(), metrics.stage('train.fit', len(X_fit)):
+        # 'balanced' weights come from the sample, which is the intent here
+        warnings.filterwarnings('ignore', message='class_weight presets')
+        clf.fit(scaler.transform(X_fit), y_fit)
+    clf.set_params(warm_start=False)
+    print(f"Added {added_trees} trees for {len(X_new)} new teams ({clf.n_estimators} in total)")
+
+    save_model(clf, scaler, store)
     return clf, scaler
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the playstyle classifier")
+    parser.add_argument('--feature-store', metavar='DIR',
+                        help="train from the feature store in DIR instead of the database")
+    parser.add_argument('--incremental', action='store_true',
+                        help="add trees for teams new to the feature store instead of retraining")
+    parser.add_argument('--no-report', action='store_true', help="skip the feature plots")
+    parser.add_argument('--report-dir', default=DEFAULT_REPORT_DIR)
+    parser.add_argument('--report-max-rows', type=int, default=DEFAULT_MAX_ROWS_PER_CLASS,
+                        help="plot at most this many teams per playstyle")
+    parser.add_argument('--metrics', nargs='?', const=DEFAULT_METRICS_PATH, metavar='PATH',
+                        help="write stage timings and database round trips to PATH (JSON) and .prom")
+    args = parser.parse_args()
+    if args.incremental and not args.feature_store:
+        parser.error("--incremental needs --feature-store")
+
     # Create models directory if it doesn't exist
     os.makedirs('models', exist_ok=True)
-    
-    clf, scaler = train_classifier() 
\ No newline at end of file
+
+    if args.metrics:
+        metrics.enable(args.metrics)
+    else:
+        metrics.enable_from_env()
+    report_dir = None if args.no_report else args.report_dir
+    try:
+        if args.incremental:
+            clf, scaler = update_classifier(args.feature_store, report_dir, args.report_max_rows)
+        else:
+            clf, scaler = train_classifier(args.feature_store, report_dir, args.report_max_rows)
+    finally:
+        metrics.summary()
+        metrics.write()
@@ -0,0 +1,120 @@
+from train_classifier import (
+    load_training_data, save_model, MODEL_PATH, LEADERBOARD_PATH
+)
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingRandomSearchCV, StratifiedKFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.ensemble import RandomForestClassifier
+import argparse
+import json
+import os
+import time
+import joblib
+import numpy as np
+
+# Fitted scalers and scaled fold data, shared by every candidate on a fold
+CACHE_DIR = '.cache/tuning'
+
+PARAM_DISTRIBUTIONS = {
+    # Well below MAX_ESTIMATORS, leaving update_classifier room to add trees
+    'clf__n_estimators': [50, 100, 200],
+    'clf__max_depth': [None, 8, 16, 32],
+    'clf__min_samples_leaf': [1, 2, 4, 8],
+    'clf__max_features': ['sqrt', 'log2', None],
+    'clf__class_weight': ['balanced', 'balanced_subsample', None]
+}
+
+def _leaderboard(search, n_splits, top=None):
+    """Candidates of the last halving round, best first, with fit and predict cost"""
+    results = search.cv_results_
+    last_round = results['iter'] == results['iter'].max()
+    entries = []
+    for i in np.flatnonzero(last_round):
+        # Each fold scores roughly 1/n_splits of the round's samples
+        test_rows = max(1, results['n_resources'][i] // n_splits)
+        entries.append({
+            'params': {key.split('__', 1)[1]: value for key, value in results['params'][i].items()},
+            'accuracy': float(results['mean_test_score'][i]),
+            'accuracy_std': float(results['std_test_score'][i]),
+            'fit_seconds': float(results['mean_fit_time'][i]),
+            'predict_ms_per_1k': float(results['mean_score_time'][i] / test_rows * 1000 * 1000),
+            'samples': int(results['n_resources'][i])
+        })
+    entries.sort(key=lambda entry: (-entry['accuracy'], entry['fit_seconds']))
+    return entries[:top] if top else entries
+
+def tune_classifier(feature_store=None, n_splits=5, n_candidates=None, n_jobs=-1, seed=42):
+    """Search RandomForest settings with successive halving and save the best
+
+    Candidates are scored by stratified ``n_splits``-fold cross-validation
+    on all cores (``n_jobs``), each round keeping the best third on three
+    times the data. The winner is refit on everything and saved as the
+    usual model and scaler, and the leaderboard goes to LEADERBOARD_PATH.
+    """
+    X, y, store = load_training_data(feature_store)
+    if len(X) < 10:
+        raise ValueError("Not enough samples for tuning. Need at least 10 teams with playstyles.")
+
+    pipeline = Pipeline([
+        ('scaler', StandardScaler()),
+        ('clf', RandomForestClassifier(random_state=seed))
+    ], memory=joblib.Memory(CACHE_DIR, verbose=0))
+
+    search = HalvingRandomSearchCV(
+        pipeline,
+        PARAM_DISTRIBUTIONS,
+        n_candidates=n_candidates or 'exhaust',
+        factor=3,
+        cv=StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed),
+        scoring='accuracy',
+        refit=True,
+        n_jobs=n_jobs,
+        random_state=seed,
+        error_score=np.nan
+    )
+
+    print(f"Tuning on {len(X)} teams with {n_splits}-fold cross-validation...")
+    start = time.perf_counter()
+    search.fit(X, y)
+    print(f"Search finished in {time.perf_counter() - start:.1f}s "
+          f"({len(search.cv_results_['params'])} candidate fits over {search.n_iterations_} rounds)")
+
+    leaderboard = _leaderboard(search, n_splits)
+    print("\nLeaderboard (last round):")
+    print(f"{'accuracy':>10} {'fit s':>8} {'ms/1k':>8}  params")
+    for entry in leaderboard[:10]:
+        print(f"{entry['accuracy']:>10.3f} {entry['fit_seconds']:>8.2f} "
+              f"{entry['predict_ms_per_1k']:>8.2f}  {entry['params']}")
+
+    best = search.best_estimator_
+    clf = best.named_steps['clf']
+    scaler = best.named_steps['scaler']
+    print(f"\nBest: {search.best_params_} (cv accuracy {search.best_score_:.3f})")
+
+    os.makedirs(os.path.dirname(LEADERBOARD_PATH), exist_ok=True)
+    with open(LEADERBOARD_PATH, 'w') as f:
+        json.dump({
+            'teams': len(X),
+            'folds': n_splits,
+            'best_params': {key.split('__', 1)[1]: value for key, value in search.best_params_.items()},
+            'best_accuracy': float(search.best_score_),
+            'leaderboard': leaderboard
+        }, f, indent=2)
+
+    save_model(clf, scaler, store)
+    print(f"Saved the best model to {MODEL_PATH} and the leaderboard to {LEADERBOARD_PATH}")
+    return clf, scaler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the playstyle classifier's hyperparameters")
+    parser.add_argument('--feature-store', metavar='DIR',
+                        help="tune on the feature store in DIR instead of the database")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--candidates', type=int,
+                        help="settings tried in the first round (default: as many as the data allows)")
+    parser.add_argument('--jobs', type=int, default=-1, help="parallel fits (default: all cores)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    tune_classifier(args.feature_store, args.folds, args.candidates, args.jobs, args.seed)